@@ -121,6 +121,7 @@ export const adminApi = {
   checkUsername: async (username) => apiFetch(`/orderapi/register/check-username?username=${encodeURIComponent(username)}`, { withAuth: false }),
   randomUsername: async (prefix = 'user') => apiFetch(`/orderapi/register/random-username?prefix=${encodeURIComponent(prefix)}`, { withAuth: false }),
   getOrder: async (orderNo) => apiFetch(`/orderapi/orders/by-no/${encodeURIComponent(orderNo)}`),
+  lookupOrders: async (orderNos) => apiFetch('/orderapi/orders/lookup', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ order_nos: orderNos }) }),
   updateOrder: async (orderNo, payload) => apiFetch(`/orderapi/orders/by-no/${encodeURIComponent(orderNo)}`, { method: 'PUT', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) }),
   createOrder: async (payload) => apiFetch('/orderapi/orders', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) }),
   deleteOrder: async (orderNo) => apiFetch(`/orderapi/orders/by-no/${encodeURIComponent(orderNo)}`, { method: 'DELETE' }),
@@ -134,7 +135,19 @@ export const adminApi = {
     const suffix = search.toString() ? `?${search.toString()}` : '';
     return apiFetch(`/orderapi/orders/export${suffix}`, { responseType: 'blob' });
   },
-  importExcel: async (file) => { const fd = new FormData(); fd.append('file', file); return apiFetch('/orderapi/import/excel', { method: 'POST', body: fd, headers: {} }); },
+  importExcel: async (file, { onProgress, pollMs = 1000 } = {}) => {
+    const fd = new FormData(); fd.append('file', file);
+    const queued = await apiFetch('/orderapi/import/excel', { method: 'POST', body: fd, headers: {} });
+    if (!queued || !queued.job_id) return queued;
+    // Import runs as a background job; poll until it finishes
+    for (;;) {
+      await new Promise((resolve) => setTimeout(resolve, pollMs));
+      const job = await apiFetch(`/orderapi/import/jobs/${encodeURIComponent(queued.job_id)}`);
+      if (onProgress) onProgress(job);
+      if (job.status === 'done') return job.stats;
+      if (job.status === 'failed') throw new Error((job.errors && job.errors[0]) || '导入失败');
+    }
+  },
   listByCode: async (code, options = {}) => {
     const params = new URLSearchParams();
     if (code !== undefined && code !== null && String(code).length > 0) params.set('code', String(code));
@@ -1,4 +1,7 @@
+import asyncio
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -25,6 +28,45 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+############################################################
+# Async hashing API backed by a dedicated process pool
+############################################################
+# pbkdf2 is CPU-heavy by design; running it in separate processes keeps a
+# login burst from freezing the IOLoop (and from holding the GIL against it).
+# The semaphore caps in-flight hashes so excess logins wait their turn
+# instead of piling up in the pool queue.
+
+HASH_WORKERS = max(1, int(os.getenv("HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))))
+HASH_CONCURRENCY = max(1, int(os.getenv("HASH_CONCURRENCY", str(HASH_WORKERS * 2))))
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        # spawn: never fork a process that already runs IOLoop / DB threads
+        _hash_pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _hash_pool
+
+
+async def _run_hash(fn, *args):
+    global _hash_semaphore
+    if _hash_semaphore is None:
+        _hash_semaphore = asyncio.Semaphore(HASH_CONCURRENCY)
+    async with _hash_semaphore:
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_pool(), fn, *args)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hash(get_password_hash, password)
+
+
 def _db_authenticate(username: str, password: str) -> bool:
     try:
         from .db import SessionLocal
@@ -45,6 +87,10 @@ def authenticate_admin(username: str, password: str) -> bool:
     # Prefer DB auth when table/record exists; fall back to env for bootstrap
     if _db_authenticate(username, password):
         return True
+    return _env_authenticate(username, password)
+
+
+def _env_authenticate(username: str, password: str) -> bool:
     admin_user = os.getenv("ADMIN_USERNAME", "admin")
     hashed = os.getenv("ADMIN_PASSWORD_HASH")
     plain = os.getenv("ADMIN_PASSWORD")
@@ -58,6 +104,27 @@ def authenticate_admin(username: str, password: str) -> bool:
     return password == "admin123"
 
 
+async def authenticate_admin_async(username: str, password: str) -> bool:
+    """Same rules as authenticate_admin: DB lookup on the worker pool, hashing in the process pool."""
+    from .executor import run_in_session
+    from .models import AdminUser
+
+    def lookup(db):
+        u = db.query(AdminUser).filter(AdminUser.username == username).one_or_none()
+        return u.password_hash if u else None
+
+    try:
+        hashed = await run_in_session(lookup)
+    except Exception:
+        hashed = None
+    if hashed and await verify_password_async(password, hashed):
+        return True
+    env_hashed = os.getenv("ADMIN_PASSWORD_HASH")
+    if env_hashed and username == os.getenv("ADMIN_USERNAME", "admin"):
+        return await verify_password_async(password, env_hashed)
+    return _env_authenticate(username, password)
+
+
 def ensure_default_admin():
     """Ensure a default admin user exists in DB when ADMIN_PASSWORD or ADMIN_PASSWORD_HASH set.
 
@@ -1,9 +1,16 @@
+import multiprocessing
 import os
+import threading
+import time
 from pathlib import Path
 from urllib.parse import quote, unquote
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from sqlalchemy.engine.url import make_url
+
+from .metrics import instrument_engine
 ##JHKDSJrShkjSsdfsd348958234%2F.0%4054
 ##JHKDSJrShkjSsdfsd348958234%2F.%24%23%4054
 class Base(DeclarativeBase):
@@ -114,6 +121,29 @@ def get_database_url() -> str:
     )
 
 
+def _build_replica_url_from_env_parts() -> str | None:
+    # Only the host is required; other parts default to the primary's values
+    host = _getenv_clean("replica_host", "DB_REPLICA_HOST", "DATABASE_REPLICA_HOST")
+    if not host:
+        return None
+    driver = _getenv_clean("replica_driver", "DB_REPLICA_DRIVER", "driver", "DB_DRIVER") or "mysql+pymysql"
+    username = _getenv_clean("replica_username", "DB_REPLICA_USERNAME", "username", "DB_USERNAME", "DATABASE_USERNAME")
+    password = _getenv_clean("replica_password", "DB_REPLICA_PASSWORD", "password", "DB_PASSWORD", "DATABASE_PASSWORD") or ""
+    port = _getenv_clean("replica_port", "DB_REPLICA_PORT", "port", "DB_PORT", "DATABASE_PORT") or "3306"
+    database = _getenv_clean("replica_database", "DB_REPLICA_NAME", "database", "DB_NAME", "DATABASE_NAME")
+    charset = _getenv_clean("charset", "DB_CHARSET") or "utf8mb4"
+    if not (username and database):
+        return None
+    user_enc = quote(username, safe="")
+    pwd_enc = quote(password, safe="")
+    return f"{driver}://{user_enc}:{pwd_enc}@{host}:{port}/{database}?charset={charset}"
+
+
+def get_replica_database_url() -> str | None:
+    """Optional read replica: `DATABASE_REPLICA_URL`, else `replica_*` split fields."""
+    return _getenv_clean("DATABASE_REPLICA_URL") or _build_replica_url_from_env_parts()
+
+
 def _mask_secret(s: str, reveal: bool = False) -> str:
     if reveal:
         return s
@@ -124,9 +154,9 @@ def _mask_secret(s: str, reveal: bool = False) -> str:
     return s[:2] + "*" * (len(s) - 4) + s[-2:]
 
 
-def db_connection_summary(reveal_password: bool = False) -> str:
+def db_connection_summary(reveal_password: bool = False, url: str | None = None) -> str:
     """Return a human-friendly summary of the DB connection (password masked by default)."""
-    url = get_database_url()
+    url = url or get_database_url()
     try:
         u = make_url(url)
         user = unquote(u.username or "")
@@ -147,22 +177,173 @@ def db_connection_summary(reveal_password: bool = False) -> str:
 # Print DB connection info at startup (masking password unless LOG_DB_CREDS=true)
 _reveal = (os.getenv("LOG_DB_CREDS", "false").lower() in {"1", "true", "yes"})
 print("[db] " + db_connection_summary(reveal_password=_reveal))
+_replica_url = get_replica_database_url()
+if _replica_url:
+    print("[db] replica " + db_connection_summary(reveal_password=_reveal, url=_replica_url))
+
+############################################################
+# Connection pool: sized/tuned via env, instrumented for /orderapi/health
+############################################################
+
+def _int_setting(name: str, default: int) -> int:
+    raw = _getenv_clean(name)
+    try:
+        return int(raw) if raw is not None else default
+    except ValueError:
+        return default
+
+
+def _bool_setting(name: str, default: bool) -> bool:
+    raw = _getenv_clean(name)
+    if raw is None:
+        return default
+    return raw.lower() in {"1", "true", "yes", "on"}
+
+
+# Keep pool_size + max_overflow (times WORKERS processes) below MySQL max_connections
+DB_POOL_SIZE = _int_setting("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = _int_setting("DB_MAX_OVERFLOW", 10)
+# Seconds before a connection is replaced; keep below MySQL wait_timeout (-1 = never)
+DB_POOL_RECYCLE = _int_setting("DB_POOL_RECYCLE", 1800)
+# Seconds a checkout waits for a free connection before raising
+DB_POOL_TIMEOUT = _int_setting("DB_POOL_TIMEOUT", 30)
+# SELECT 1 on every checkout; with DB_POOL_RECYCLE below wait_timeout it can usually be off
+DB_POOL_PRE_PING = _bool_setting("DB_POOL_PRE_PING", True)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection.
+
+    The measured time includes opening a new connection when the pool grows.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                if waited > self.wait_seconds_max:
+                    self.wait_seconds_max = waited
+
+
+def _engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite picks its own pool class (file vs :memory:); sizing does not apply
+        return options
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return options
+
 
-engine = create_engine(get_database_url(), pool_pre_ping=True)
+engine = create_engine(get_database_url(), **_engine_options(get_database_url()))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
+
+
+############################################################
+# Optional read replica for read-only handlers
+############################################################
+# Reads fall back to the primary while the replica may not have caught up
+# with a recent write, and for a cool-down period after a replica error.
+
+# Seconds after a commit on this host during which reads stay on the primary
+REPLICA_STALE_SECONDS = float(_getenv_clean("REPLICA_STALE_SECONDS") or 5)
+# Seconds the replica is skipped after a connection error
+REPLICA_RETRY_SECONDS = float(_getenv_clean("REPLICA_RETRY_SECONDS") or 30)
+
+replica_engine = create_engine(_replica_url, **_engine_options(_replica_url)) if _replica_url else None
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine or engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+
+# Shared memory created before any fork, so every worker process sees the
+# latest commit time (wall clock) of all its siblings.
+_last_primary_commit = multiprocessing.Value("d", 0.0, lock=False)
+_replica_down_until = 0.0
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _note_primary_commit(session):
+    _last_primary_commit.value = time.time()
+
+
+def replica_available() -> bool:
+    """True when a replica is configured, healthy and no recent write could be missing from it."""
+    if replica_engine is None:
+        return False
+    now = time.time()
+    if now < _replica_down_until:
+        return False
+    return now - _last_primary_commit.value >= REPLICA_STALE_SECONDS
+
+
+def mark_replica_failed() -> None:
+    global _replica_down_until
+    _replica_down_until = time.time() + REPLICA_RETRY_SECONDS
+
+
+def pool_stats(bind=None) -> dict:
+    """Live connection pool figures (counters restart when the pool is disposed)."""
+    pool = (bind or engine).pool
+    stats = {"class": type(pool).__name__, "pre_ping": DB_POOL_PRE_PING}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update(
+                max_overflow=DB_MAX_OVERFLOW,
+                timeout=DB_POOL_TIMEOUT,
+                recycle=DB_POOL_RECYCLE,
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_seconds_total=round(pool.wait_seconds_total, 6),
+                wait_seconds_max=round(pool.wait_seconds_max, 6),
+                wait_ms_avg=round(pool.wait_seconds_total * 1000 / pool.checkouts, 3) if pool.checkouts else 0.0,
+            )
+    return stats
+
+
+def dispose_engine_after_fork():
+    """Forget pooled connections inherited from the parent process.
+
+    Call in each forked worker before it touches the database. ``close=False``
+    leaves the parent's sockets untouched; the child opens fresh connections.
+    """
+    engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.dispose(close=False)
 
 
 def init_db():
-    from .models import Order, AdminUser, AnnouncementHistory, Setting, UserCode
+    from .migrations import run_migrations
+    from .models import Order, AdminUser, AnnouncementHistory, Setting, UserCode, SchemaVersion, OrderSummary
     Base.metadata.create_all(bind=engine)
-    # Best-effort add missing columns for MySQL deployments without migrations
-    try:
-        if engine.dialect.name.startswith('mysql'):
-            with engine.connect() as conn:
-                conn.execute(text("ALTER TABLE orders ADD COLUMN wooden_crate TINYINT(1) NULL"))
-                conn.execute(text("ALTER TABLE admin_users ADD COLUMN role VARCHAR(32) NOT NULL DEFAULT 'user'"))
-                conn.execute(text("ALTER TABLE admin_users ADD COLUMN is_active TINYINT(1) NOT NULL DEFAULT 1"))
-                conn.execute(text("ALTER TABLE user_codes ADD CONSTRAINT uq_user_codes_code UNIQUE (code)"))
-    except Exception:
-        # Ignore if column already exists or insufficient privileges
-        pass
+    # Versioned, run-once schema changes for databases created by older releases
+    run_migrations(engine)
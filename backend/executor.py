@@ -0,0 +1,180 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from .db import ReadSessionLocal, SessionLocal, mark_replica_failed, replica_available
+from .metrics import REQUEST_STATS
+
+
+############################################################
+# Bounded worker pool for blocking (SQLAlchemy / file) work
+############################################################
+# Tornado runs every handler on a single IOLoop thread. Anything that blocks
+# (a MySQL round trip, parsing an uploaded workbook) is handed to this pool
+# and awaited, so one slow call no longer stalls every other request.
+
+DB_EXECUTOR_WORKERS = max(1, int(os.getenv("DB_EXECUTOR_WORKERS", "8")))
+# 0 = unlimited; otherwise reject new work with ExecutorBusy once this many
+# calls are already waiting for a free worker.
+DB_EXECUTOR_MAX_QUEUE = max(0, int(os.getenv("DB_EXECUTOR_MAX_QUEUE", "0")))
+
+
+class ExecutorBusy(Exception):
+    """Raised when the worker queue is full; handlers answer 503."""
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor wrapper that tracks queue depth and active workers."""
+
+    def __init__(self, max_workers: int, max_queue: int = 0, name: str = "db"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.name = name
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+        self._max_queued = 0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        # Created lazily so no threads exist before the server is started
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.max_queue and self._queued >= self.max_queue:
+                self._rejected += 1
+                raise ExecutorBusy(f"{self.name} executor queue is full ({self._queued})")
+            self._queued += 1
+            if self._queued > self._max_queued:
+                self._max_queued = self._queued
+
+        def run():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+
+        return self._get_pool().submit(run)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "max_queued": self._max_queued,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+DB_EXECUTOR = BoundedExecutor(DB_EXECUTOR_WORKERS, DB_EXECUTOR_MAX_QUEUE, name="db")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run ``fn(*args, **kwargs)`` on the DB executor and await its result.
+
+    Time spent running on the worker (not waiting for one) is added to the
+    calling request's metrics. The call runs in a copy of the caller's context
+    so SQL hooks on the worker thread attribute statements to the request.
+    """
+    call = functools.partial(fn, *args, **kwargs)
+    stats = REQUEST_STATS.get()
+    if stats is not None:
+        def timed():
+            start = time.perf_counter()
+            try:
+                return call()
+            finally:
+                stats.db_seconds += time.perf_counter() - start
+                stats.db_calls += 1
+        future = DB_EXECUTOR.submit(contextvars.copy_context().run, timed)
+    else:
+        future = DB_EXECUTOR.submit(call)
+    return await asyncio.wrap_future(future)
+
+
+async def run_in_session(fn, *args, _factory=SessionLocal, **kwargs):
+    """Open a session on a worker thread, call ``fn(db, *args)`` and always close it."""
+    def work():
+        db = _factory()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    return await run_blocking(work)
+
+
+def _replica_unreachable(exc: DBAPIError) -> bool:
+    return isinstance(exc, OperationalError) or exc.connection_invalidated
+
+
+async def run_in_read_session(fn, *args, **kwargs):
+    """``run_in_session`` for read-only work: uses the replica when it is usable.
+
+    ``fn`` must not write. If the replica cannot be reached the call is retried
+    on the primary and the replica is skipped for a while.
+    """
+    if not replica_available():
+        return await run_in_session(fn, *args, **kwargs)
+    try:
+        return await run_in_session(fn, *args, _factory=ReadSessionLocal, **kwargs)
+    except DBAPIError as exc:
+        if not _replica_unreachable(exc):
+            raise
+        mark_replica_failed()
+        return await run_in_session(fn, *args, **kwargs)
+
+
+async def stream_partitions(stmt, size: int, read_only: bool = False):
+    """Yield batches of rows for ``stmt`` from a server-side cursor.
+
+    Each batch is fetched by a separate pool task, so a long export holds one
+    connection but only borrows a worker while rows are actually being read.
+    Consumers should wrap this in ``contextlib.aclosing`` so the session is
+    released when the client goes away mid-stream. ``read_only`` streams from
+    the replica when one is usable (falling back to the primary if it cannot
+    be reached before the first row).
+    """
+    on_replica = read_only and replica_available()
+    db = ReadSessionLocal() if on_replica else SessionLocal()
+    try:
+        try:
+            result = await run_blocking(db.execute, stmt.execution_options(yield_per=size))
+        except DBAPIError as exc:
+            if not on_replica or not _replica_unreachable(exc):
+                raise
+            mark_replica_failed()
+            await run_blocking(db.close)
+            db = SessionLocal()
+            result = await run_blocking(db.execute, stmt.execution_options(yield_per=size))
+        partitions = result.partitions()
+        while True:
+            rows = await run_blocking(next, partitions, None)
+            if not rows:
+                break
+            yield rows
+    finally:
+        await run_blocking(db.close)
+
+
+def executor_stats() -> dict:
+    return DB_EXECUTOR.stats()
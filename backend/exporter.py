@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import os
+
+from openpyxl import Workbook
+
+from .models import Order
+
+
+# Rows fetched per server-side cursor batch / bytes per chunk flushed to the client
+EXPORT_BATCH_SIZE = max(100, int(os.getenv("EXPORT_BATCH_SIZE", "2000")))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# format -> (Content-Type, file extension)
+EXPORT_FORMATS = {
+    "xlsx": (XLSX_CONTENT_TYPE, "xlsx"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson; charset=utf-8", "ndjson"),
+}
+
+EXPORT_HEADERS = ["订单号", "编号", "重量(kg)", "运费", "状态", "木架", "更新时间"]
+# Plain columns instead of ORM entities: no identity map, no per-row object overhead
+EXPORT_COLUMNS = (
+    Order.order_no,
+    Order.group_code,
+    Order.weight_kg,
+    Order.shipping_fee,
+    Order.status,
+    Order.wooden_crate,
+    Order.updated_at,
+)
+
+
+# Machine-readable field names for CSV / NDJSON (same keys as the JSON API)
+EXPORT_FIELDS = ["order_no", "group_code", "weight_kg", "shipping_fee", "status", "wooden_crate", "updated_at"]
+
+
+def crate_label(value) -> str:
+    return "是" if value is True else ("否" if value is False else "未设置")
+
+
+def xlsx_row(row) -> list:
+    order_no, group_code, weight, fee, status, crate, updated_at = row
+    return [
+        order_no,
+        group_code or '',
+        float(weight) if weight is not None else '',
+        float(fee) if fee is not None else '',
+        status,
+        crate_label(crate),
+        updated_at.isoformat() if updated_at else '',
+    ]
+
+
+class XlsxExportWriter:
+    """openpyxl write-only workbook: rows are serialized as they arrive, not kept as cells."""
+
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("orders")
+        self.ws.append(EXPORT_HEADERS)
+        self.rows = 0
+
+    def append_rows(self, rows) -> None:
+        for row in rows:
+            self.ws.append(xlsx_row(row))
+        self.rows += len(rows)
+
+    def save(self, path: str) -> None:
+        self.wb.save(path)
+
+
+def csv_header() -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerow(EXPORT_FIELDS)
+    return buf.getvalue().encode("utf-8")
+
+
+def csv_chunk(rows) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for order_no, group_code, weight, fee, status, crate, updated_at in rows:
+        writer.writerow([
+            order_no,
+            group_code or '',
+            weight if weight is not None else '',
+            fee if fee is not None else '',
+            status,
+            '' if crate is None else int(bool(crate)),
+            updated_at.isoformat() if updated_at else '',
+        ])
+    return buf.getvalue().encode("utf-8")
+
+
+def ndjson_chunk(rows) -> bytes:
+    lines = []
+    for order_no, group_code, weight, fee, status, crate, updated_at in rows:
+        lines.append(json.dumps({
+            "order_no": order_no,
+            "group_code": group_code,
+            "weight_kg": weight,
+            "shipping_fee": fee,
+            "status": status,
+            "wooden_crate": crate,
+            "updated_at": updated_at.isoformat() if updated_at else None,
+        }, ensure_ascii=False))
+    lines.append("")
+    return "\n".join(lines).encode("utf-8")
+
+
+STREAM_ENCODERS = {"csv": csv_chunk, "ndjson": ndjson_chunk}
@@ -1,15 +1,31 @@
-from typing import Tuple
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
 from openpyxl import load_workbook
 
 from .models import Order, STATUSES
+from .summary import SummaryDelta
+
+
+# Rows per prefetch / multi-row upsert / commit
+IMPORT_BATCH_SIZE = max(1, int(os.getenv("IMPORT_BATCH_SIZE", "1000")))
+# Parsed batches buffered ahead of the DB writer
+IMPORT_PREFETCH_BATCHES = 2
 
+EXPECTED_HEADERS = ["order_no", "group_code", "weight_kg", "status", "shipping_fee"]
 
-def upsert_order_from_row(db: Session, row: dict) -> Tuple[bool, bool]:
-    """Return (created, updated) flags."""
+
+def normalize_row(row: dict) -> Optional[dict]:
+    """Clean one spreadsheet row; returns None when it has no order number."""
     order_no = str(row.get("order_no") or "").strip()
     if not order_no:
-        return (False, False)
+        return None
 
     group_code = (row.get("group_code") or None) or None
     status = row.get("status") or STATUSES[0]
@@ -25,47 +41,234 @@ def upsert_order_from_row(db: Session, row: dict) -> Tuple[bool, bool]:
         fee = float(fee) if fee is not None and fee != "" else None
     except Exception:
         fee = None
+    return {"order_no": order_no, "group_code": group_code, "status": status, "weight_kg": weight, "shipping_fee": fee}
 
-    created = False
-    updated = False
-    obj = db.query(Order).filter(Order.order_no == order_no).one_or_none()
-    if obj is None:
-        obj = Order(order_no=order_no)
-        created = True
-
-    # set values
-    obj.group_code = group_code
-    obj.status = status
-    if weight is not None:
-        obj.weight_kg = weight
-    if fee is not None:
-        obj.shipping_fee = fee
-
-    db.add(obj)
-    db.flush()
-    if not created:
-        updated = True
-    return (created, updated)
+
+def _upsert_mysql(db: Session, rows: list, now: datetime) -> None:
+    # One multi-row INSERT ... ON DUPLICATE KEY UPDATE per batch. Empty weight/fee
+    # cells keep the stored value.
+    table = Order.__table__
+    stmt = mysql_insert(table).values([{**r, "created_at": now, "updated_at": now} for r in rows])
+    stmt = stmt.on_duplicate_key_update(
+        group_code=stmt.inserted.group_code,
+        status=stmt.inserted.status,
+        weight_kg=func.coalesce(stmt.inserted.weight_kg, table.c.weight_kg),
+        shipping_fee=func.coalesce(stmt.inserted.shipping_fee, table.c.shipping_fee),
+        updated_at=stmt.inserted.updated_at,
+    )
+    db.execute(stmt)
+
+
+def _upsert_generic(db: Session, rows: list, existing: dict, now: datetime) -> None:
+    # Collapse repeated order numbers first so each key is written once
+    merged: dict[str, dict] = {}
+    for r in rows:
+        prev = merged.get(r["order_no"])
+        if prev is None:
+            merged[r["order_no"]] = dict(r)
+            continue
+        prev["group_code"] = r["group_code"]
+        prev["status"] = r["status"]
+        if r["weight_kg"] is not None:
+            prev["weight_kg"] = r["weight_kg"]
+        if r["shipping_fee"] is not None:
+            prev["shipping_fee"] = r["shipping_fee"]
+
+    new_rows = []
+    changed = []
+    for order_no, r in merged.items():
+        oid = existing.get(order_no)
+        if oid is None:
+            new_rows.append({**r, "created_at": now, "updated_at": now})
+            continue
+        values = {"id": oid, "group_code": r["group_code"], "status": r["status"], "updated_at": now}
+        if r["weight_kg"] is not None:
+            values["weight_kg"] = r["weight_kg"]
+        if r["shipping_fee"] is not None:
+            values["shipping_fee"] = r["shipping_fee"]
+        changed.append(values)
+    if new_rows:
+        db.execute(insert(Order), new_rows)
+    if changed:
+        # ORM bulk UPDATE by primary key (executemany, grouped by column set)
+        db.execute(update(Order), changed)
 
 
-def import_excel(db: Session, file_path: str) -> dict:
-    wb = load_workbook(filename=file_path)
-    ws = wb.active
-    # Expect headers in first row: order_no, group_code, weight_kg, status, shipping_fee
-    headers = [str(c.value).strip() if c.value is not None else "" for c in next(ws.iter_rows(min_row=1, max_row=1))[0:5]]
-    # Fallback mapping
-    expected = ["order_no", "group_code", "weight_kg", "status", "shipping_fee"]
-    if any(h not in expected for h in headers):
-        headers = expected
+def _summary_delta(rows: list, current: dict) -> SummaryDelta:
+    """Summary changes for a batch, replaying the upsert semantics row by row.
+
+    ``current`` maps existing order numbers to (group_code, status, weight_kg,
+    shipping_fee) and is updated in place, so repeated numbers chain correctly.
+    """
+    delta = SummaryDelta()
+    for r in rows:
+        before = current.get(r["order_no"])
+        if before is None:
+            after = (r["group_code"], r["status"], r["weight_kg"], r["shipping_fee"])
+        else:
+            delta.remove(*before)
+            after = (
+                r["group_code"],
+                r["status"],
+                r["weight_kg"] if r["weight_kg"] is not None else before[2],
+                r["shipping_fee"] if r["shipping_fee"] is not None else before[3],
+            )
+        delta.add(*after)
+        current[r["order_no"]] = after
+    return delta
+
+
+def bulk_upsert_rows(db: Session, rows: list) -> Tuple[int, int]:
+    """Upsert a batch of normalized rows and commit; returns (created, updated).
+
+    Existing order numbers are prefetched with one IN query, then the batch is
+    written with a single multi-row statement on MySQL (bulk insert + bulk
+    update elsewhere), instead of a SELECT and flush per row. The prefetched
+    values also give the batch's order_summary delta, applied in the same commit.
+    """
+    if not rows:
+        return (0, 0)
+    order_nos = sorted({r["order_no"] for r in rows})
+    # Locked until the commit below so a concurrent PUT/delete/import cannot
+    # change these rows between reading the "before" values and the upsert
+    prefetched = db.query(
+        Order.order_no, Order.id, Order.group_code, Order.status, Order.weight_kg, Order.shipping_fee
+    ).filter(Order.order_no.in_(order_nos)).with_for_update().all()
+    existing = {p.order_no: p.id for p in prefetched}
 
     created = 0
     updated = 0
-    for r in ws.iter_rows(min_row=2, values_only=True):
-        data = {headers[i]: r[i] if i < len(r) else None for i in range(len(headers))}
-        c, u = upsert_order_from_row(db, data)
-        created += (1 if c else 0)
-        updated += (1 if u and not c else 0)
+    seen = set(existing)
+    for r in rows:
+        if r["order_no"] in seen:
+            updated += 1
+        else:
+            created += 1
+            seen.add(r["order_no"])
+    delta = _summary_delta(rows, {p.order_no: (p.group_code, p.status, p.weight_kg, p.shipping_fee) for p in prefetched})
 
+    now = datetime.utcnow()
+    if db.get_bind().dialect.name.startswith("mysql"):
+        _upsert_mysql(db, rows, now)
+    else:
+        _upsert_generic(db, rows, existing, now)
+    delta.apply(db)
     db.commit()
+    return (created, updated)
+
+
+############################################################
+# Streaming pipeline: parse -> normalize/validate -> batch -> upsert
+############################################################
+
+def iter_sheet_rows(file_path: str) -> Iterator[dict]:
+    """Yield row dicts from the active sheet, decoding lazily in read-only mode."""
+    wb = load_workbook(filename=file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        first = next(rows, None)
+        if first is None:
+            return
+        # Expect headers in first row: order_no, group_code, weight_kg, status, shipping_fee
+        headers = [str(v).strip() if v is not None else "" for v in first[0:5]]
+        # Fallback mapping
+        if any(h not in EXPECTED_HEADERS for h in headers):
+            headers = EXPECTED_HEADERS
+        for r in rows:
+            yield {headers[i]: r[i] if i < len(r) else None for i in range(len(headers))}
+    finally:
+        wb.close()
+
+
+def normalized_rows(rows: Iterable[dict], counts: Optional[dict] = None) -> Iterator[dict]:
+    for raw in rows:
+        data = normalize_row(raw)
+        if data is not None:
+            yield data
+        elif counts is not None:
+            counts["skipped"] = counts.get("skipped", 0) + 1
+
+
+def batched(rows: Iterable[dict], size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_END = object()
+
+
+def prefetch(items: Iterable, depth: int = IMPORT_PREFETCH_BATCHES) -> Iterator:
+    """Produce ``items`` on a helper thread so parsing overlaps with the consumer's DB writes."""
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except BaseException as exc:
+            put((_END, exc))
+            return
+        put((_END, None))
+
+    t = threading.Thread(target=produce, name="import-parse", daemon=True)
+    t.start()
+    try:
+        while True:
+            item, exc = q.get()
+            if item is _END:
+                if exc is not None:
+                    raise exc
+                return
+            yield item
+    finally:
+        stop.set()
+        t.join()
+
+
+def import_rows(db: Session, rows: Iterable[dict], batch_size: int = IMPORT_BATCH_SIZE, progress: Optional[Callable[[dict], None]] = None, on_batch: Optional[Callable[[list], None]] = None) -> dict:
+    """Normalize raw row dicts and upsert them in committed batches.
+
+    ``progress`` (optional) receives running totals after every committed batch:
+    ``{"rows", "created", "updated", "skipped"}``. ``on_batch`` (optional)
+    receives the batch's normalized rows once it is committed, e.g. to
+    invalidate caches or publish change events.
+    """
+    created = 0
+    updated = 0
+    rows_done = 0
+    counts = {"skipped": 0}
+    for batch in prefetch(batched(normalized_rows(rows, counts), batch_size)):
+        c, u = bulk_upsert_rows(db, batch)
+        if on_batch is not None:
+            on_batch(batch)
+        created += c
+        updated += u
+        rows_done += len(batch)
+        if progress is not None:
+            progress({"rows": rows_done, "created": created, "updated": updated, "skipped": counts["skipped"]})
+    if progress is not None:
+        # Rows skipped after the last batch are only counted once parsing ends
+        progress({"rows": rows_done, "created": created, "updated": updated, "skipped": counts["skipped"]})
     return {"created": created, "updated": updated}
 
+
+def import_excel(db: Session, file_path: str, progress: Optional[Callable[[dict], None]] = None, on_batch: Optional[Callable[[list], None]] = None) -> dict:
+    return import_rows(db, iter_sheet_rows(file_path), progress=progress, on_batch=on_batch)
@@ -0,0 +1,185 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from .db import SessionLocal
+from .executor import BoundedExecutor
+from .importer import import_excel
+from .metrics import observe_import, start_request
+from .rundir import prepare_run_dir
+
+
+############################################################
+# Background Excel import jobs
+############################################################
+# Uploads are handed to a small dedicated pool (separate from the DB request
+# pool) and tracked in memory so admins can poll progress by job id. Each job
+# also writes a JSON snapshot to this run's subdirectory of IMPORT_JOB_DIR,
+# so with several worker processes (WORKERS) a poll landing on another
+# process still finds it. A single process keeps jobs in memory only.
+
+IMPORT_WORKERS = max(1, int(os.getenv("IMPORT_WORKERS", "2")))
+# Finished jobs are kept this long (seconds) for polling, then dropped
+IMPORT_JOB_RETENTION = int(os.getenv("IMPORT_JOB_RETENTION", "3600"))
+IMPORT_JOB_DIR = os.getenv("IMPORT_JOB_DIR") or os.path.join(tempfile.gettempdir(), "automatica-import-jobs")
+
+IMPORT_EXECUTOR = BoundedExecutor(IMPORT_WORKERS, name="import")
+
+# Set by prepare_job_dir() in the pre-fork parent; None = no snapshots
+_run_dir: Optional[str] = None
+
+
+class ImportJob:
+    def __init__(self, filename: str, submitted_by: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.submitted_by = submitted_by
+        self.status = "queued"  # queued, running, done, failed
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors: list[str] = []
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def progress(self, counts: dict) -> None:
+        with self._lock:
+            self.rows = counts.get("rows", self.rows)
+            self.created = counts.get("created", self.created)
+            self.updated = counts.get("updated", self.updated)
+            self.skipped = counts.get("skipped", self.skipped)
+        self.save_snapshot()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = (end - self.started_at) if self.started_at else 0.0
+            return {
+                "id": self.id,
+                "status": self.status,
+                "filename": self.filename,
+                "submitted_by": self.submitted_by,
+                "rows": self.rows,
+                "created": self.created,
+                "updated": self.updated,
+                "skipped": self.skipped,
+                "errors": list(self.errors),
+                "elapsed_seconds": round(elapsed, 3),
+                "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else None,
+                "stats": {"created": self.created, "updated": self.updated, "skipped": self.skipped},
+            }
+
+    def save_snapshot(self) -> None:
+        if _run_dir is None:
+            return
+        path = _snapshot_path(self.id)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as fh:
+                json.dump(self.to_dict(), fh, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            # Snapshots only serve other processes; the in-memory job stays authoritative
+            pass
+
+
+def _snapshot_path(job_id: str) -> str:
+    return os.path.join(_run_dir, f"{job_id}.json")
+
+
+def prepare_job_dir() -> None:
+    """Create this run's snapshot directory under IMPORT_JOB_DIR; call in the parent before forking."""
+    global _run_dir
+    _run_dir = prepare_run_dir(IMPORT_JOB_DIR)
+
+
+_jobs: dict[str, ImportJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def _prune_jobs() -> None:
+    cutoff = time.time() - IMPORT_JOB_RETENTION
+    with _jobs_lock:
+        for job_id in [j.id for j in _jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            _jobs.pop(job_id, None)
+    if _run_dir is None:
+        return
+    try:
+        names = os.listdir(_run_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(_run_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _run_job(job: ImportJob, path: str, on_batch: Optional[Callable[[list], None]]) -> dict:
+    job.status = "running"
+    job.started_at = time.time()
+    # Attributes statements (and slow-query log lines) to this job
+    start_request(f"import job {job.id}")
+    job.save_snapshot()
+    db = SessionLocal()
+    try:
+        stats = import_excel(db, path, progress=job.progress, on_batch=on_batch)
+        job.status = "done"
+        return stats
+    except Exception as exc:
+        db.rollback()
+        job.errors.append(str(exc) or exc.__class__.__name__)
+        job.status = "failed"
+        raise
+    finally:
+        job.finished_at = time.time()
+        job.save_snapshot()
+        observe_import(job.status, job.finished_at - job.started_at, job.rows)
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def submit_import_job(path: str, filename: str, submitted_by: Optional[str] = None, on_batch: Optional[Callable[[list], None]] = None) -> tuple[ImportJob, Future]:
+    """Queue ``path`` for import; the job takes ownership of (and deletes) the file.
+
+    ``on_batch`` is called on the worker with each committed batch's normalized rows.
+    Returns the job and the worker future (wrap it with ``asyncio.wrap_future``
+    to wait for completion).
+    """
+    _prune_jobs()
+    job = ImportJob(filename, submitted_by)
+    with _jobs_lock:
+        _jobs[job.id] = job
+    job.save_snapshot()
+    return job, IMPORT_EXECUTOR.submit(_run_job, job, path, on_batch)
+
+
+def get_import_job(job_id: str) -> Optional[ImportJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def get_import_job_status(job_id: str) -> Optional[dict]:
+    """Job state as served to pollers: local job first, then another process's snapshot."""
+    job = get_import_job(job_id)
+    if job is not None:
+        return job.to_dict()
+    if _run_dir is None:
+        return None
+    try:
+        with open(_snapshot_path(job_id), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,321 @@
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Iterable, Optional
+
+from .rundir import pid_alive, prepare_run_dir
+
+
+############################################################
+# In-process metrics rendered in the Prometheus text format
+############################################################
+# Counters and histograms are plain dicts behind one lock, so recording a
+# request costs a few dict updates. With several worker processes (WORKERS)
+# each process periodically writes a snapshot to this run's subdirectory of
+# METRICS_DIR and the metrics endpoint merges the snapshots of its live
+# siblings; a single process reports only its own series.
+
+METRICS_DIR = os.getenv("METRICS_DIR") or os.path.join(tempfile.gettempdir(), "automatica-metrics")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# Statements slower than this are logged with the route that issued them (0 = off)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Requests issuing more statements than this are logged as likely N+1 loops (0 = off)
+QUERY_COUNT_WARN = int(os.getenv("QUERY_COUNT_WARN", "50"))
+
+slow_query_log = logging.getLogger("automatica.sql")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+# Long-lived streams (SSE) stay open for minutes to hours
+STREAM_BUCKETS = (1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 14400.0, 43200.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+METRIC_HELP = {
+    "automatica_http_requests_total": ("counter", "HTTP requests by handler, method and status."),
+    "automatica_http_request_duration_seconds": ("histogram", "HTTP request latency by handler and method."),
+    "automatica_http_request_db_seconds": ("histogram", "Time spent in pooled DB work per request."),
+    "automatica_http_request_queries": ("histogram", "SQL statements executed per request."),
+    "automatica_http_stream_duration_seconds": ("histogram", "Lifetime of streaming responses (order events) by handler."),
+    "automatica_import_duration_seconds": ("histogram", "Excel import job duration by result."),
+    "automatica_import_rows_total": ("counter", "Rows processed by Excel import jobs by result."),
+    "automatica_export_duration_seconds": ("histogram", "Order export duration by format."),
+    "automatica_export_rows_total": ("counter", "Rows written by order exports by format."),
+}
+
+
+class RequestStats:
+    """Per-request accumulator; set in a context variable by BaseHandler.prepare.
+
+    ``run_blocking`` runs pool work inside a copy of the request's context, so
+    the SQL hooks below see the same object from worker threads.
+    """
+
+    __slots__ = ("route", "db_seconds", "db_calls", "query_seconds", "query_count")
+
+    def __init__(self, route: str = "-"):
+        self.route = route
+        self.db_seconds = 0.0
+        self.db_calls = 0
+        self.query_seconds = 0.0
+        self.query_count = 0
+
+
+REQUEST_STATS: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def start_request(route: str = "-") -> RequestStats:
+    stats = RequestStats(route)
+    REQUEST_STATS.set(stats)
+    return stats
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._histograms: dict[tuple, list] = {}
+        self._buckets: dict[str, tuple] = {}
+
+    def inc(self, name: str, labels: dict, value: float = 1.0) -> None:
+        key = (name, _key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: dict, value: float, buckets: tuple = LATENCY_BUCKETS) -> None:
+        key = (name, _key(labels))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                self._buckets[name] = buckets
+                series = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, list(labels), list(series)] for (name, labels), series in self._histograms.items()],
+                "buckets": {name: list(b) for name, b in self._buckets.items()},
+            }
+
+
+REGISTRY = Registry()
+
+
+def observe_request(handler: str, method: str, status: int, seconds: float, db_seconds: float, queries: int = 0) -> None:
+    REGISTRY.inc("automatica_http_requests_total", {"handler": handler, "method": method, "status": str(status)})
+    REGISTRY.observe("automatica_http_request_duration_seconds", {"handler": handler, "method": method}, seconds)
+    REGISTRY.observe("automatica_http_request_db_seconds", {"handler": handler, "method": method}, db_seconds)
+    REGISTRY.observe("automatica_http_request_queries", {"handler": handler, "method": method}, queries, QUERY_COUNT_BUCKETS)
+
+
+def observe_stream(handler: str, method: str, status: int, seconds: float) -> None:
+    # Kept out of the request latency histogram, which streams would swamp
+    REGISTRY.inc("automatica_http_requests_total", {"handler": handler, "method": method, "status": str(status)})
+    REGISTRY.observe("automatica_http_stream_duration_seconds", {"handler": handler, "method": method}, seconds, STREAM_BUCKETS)
+
+
+def observe_import(result: str, seconds: float, rows: int) -> None:
+    REGISTRY.observe("automatica_import_duration_seconds", {"result": result}, seconds, JOB_BUCKETS)
+    REGISTRY.inc("automatica_import_rows_total", {"result": result}, rows)
+
+
+def observe_export(fmt: str, seconds: float, rows: int) -> None:
+    REGISTRY.observe("automatica_export_duration_seconds", {"format": fmt}, seconds, JOB_BUCKETS)
+    REGISTRY.inc("automatica_export_rows_total", {"format": fmt}, rows)
+
+
+############################################################
+# SQL statement hooks
+############################################################
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._automatica_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_automatica_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = REQUEST_STATS.get()
+    if stats is not None:
+        stats.query_seconds += elapsed
+        stats.query_count += 1
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_query_log.warning(
+            "slow query %.1f ms [%s]%s: %s",
+            elapsed * 1000,
+            stats.route if stats is not None else "-",
+            " (executemany)" if executemany else "",
+            " ".join(statement.split())[:1000],
+        )
+
+
+def log_query_heavy_request(stats: RequestStats) -> None:
+    if QUERY_COUNT_WARN and stats.query_count > QUERY_COUNT_WARN:
+        slow_query_log.warning(
+            "%d statements (%.1f ms) in one request [%s]",
+            stats.query_count,
+            stats.query_seconds * 1000,
+            stats.route,
+        )
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement on ``engine`` against the current request."""
+    from sqlalchemy import event
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+############################################################
+# Multi-process snapshots
+############################################################
+
+# Set by prepare_shared_dir() in the pre-fork parent; None = single process
+_run_dir: Optional[str] = None
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(_run_dir, f"{pid}.json")
+
+
+def prepare_shared_dir() -> None:
+    """Create this run's snapshot directory under METRICS_DIR; call in the parent before forking."""
+    global _run_dir
+    _run_dir = prepare_run_dir(METRICS_DIR)
+
+
+def write_snapshot() -> None:
+    if _run_dir is None:
+        return
+    path = _snapshot_path(os.getpid())
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(REGISTRY.snapshot(), fh)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def sibling_snapshots() -> list:
+    """Snapshots written by this run's other live worker processes."""
+    out = []
+    if _run_dir is None:
+        return out
+    try:
+        names = os.listdir(_run_dir)
+    except OSError:
+        return out
+    own = os.getpid()
+    # A worker that died leaves its file behind and its pid may be reused by
+    # an unrelated process, so only recently flushed snapshots count
+    fresh_after = time.time() - 3 * METRICS_FLUSH_SECONDS
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext != ".json" or not stem.isdigit():
+            continue
+        pid = int(stem)
+        path = os.path.join(_run_dir, name)
+        try:
+            if pid == own or not pid_alive(pid) or os.path.getmtime(path) < fresh_after:
+                continue
+            with open(path, encoding="utf-8") as fh:
+                out.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+############################################################
+# Text exposition
+############################################################
+
+def _fmt_labels(labels: Iterable) -> str:
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(snapshots: list, samples: Iterable = ()) -> str:
+    """Merge ``snapshots`` (summing series) and render them with ``samples``.
+
+    ``samples`` are ``(name, kind, help, labels dict, value)`` tuples read at
+    scrape time; ``kind`` is "gauge" or, for totals that only grow while the
+    process lives, "counter" (named ``*_total``).
+    """
+    counters: dict[tuple, float] = {}
+    histograms: dict[tuple, list] = {}
+    buckets: dict[str, list] = {}
+    for snap in snapshots:
+        buckets.update(snap.get("buckets", {}))
+        for name, labels, value in snap.get("counters", []):
+            key = (name, tuple(tuple(p) for p in labels))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, series in snap.get("histograms", []):
+            key = (name, tuple(tuple(p) for p in labels))
+            prev = histograms.get(key)
+            histograms[key] = list(series) if prev is None else [a + b for a, b in zip(prev, series)]
+
+    lines: list[str] = []
+    seen: set[str] = set()
+
+    def header(name: str, kind: str, help_text: str) -> None:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        kind, help_text = METRIC_HELP.get(name, ("counter", name))
+        header(name, kind, help_text)
+        lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+    for (name, labels), series in sorted(histograms.items()):
+        kind, help_text = METRIC_HELP.get(name, ("histogram", name))
+        header(name, kind, help_text)
+        cumulative = 0
+        for bound, count in zip(buckets.get(name, []), series):
+            cumulative += count
+            lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', _fmt_value(float(bound))),))} {cumulative}")
+        cumulative += series[len(buckets.get(name, []))]
+        lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {cumulative}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(float(series[-1]))}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {cumulative}")
+    # Series of one metric family must be contiguous in the exposition
+    for name, kind, help_text, labels, value in sorted(samples, key=lambda g: g[0]):
+        if value is None:
+            continue
+        header(name, kind, help_text)
+        lines.append(f"{name}{_fmt_labels(sorted(labels.items()))} {_fmt_value(float(value))}")
+    return "\n".join(lines) + "\n"
+
+
+def render_all(samples: Iterable = ()) -> str:
+    """This process's live series plus every live sibling's latest snapshot."""
+    return render([REGISTRY.snapshot()] + sibling_snapshots(), samples)
@@ -0,0 +1,174 @@
+import logging
+import sys
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+
+############################################################
+# Versioned schema migrations
+############################################################
+# Base.metadata.create_all() creates missing tables in their current shape;
+# the steps below bring databases created by older releases (or by
+# db/automatica.sql) up to date. Each step runs once, is recorded in
+# schema_version, and checks the live schema first so it is a no-op on
+# tables create_all just built. Once everything is applied a boot costs a
+# single SELECT on schema_version.
+
+log = logging.getLogger("automatica.migrations")
+
+# MySQL named lock so several hosts booting together do not race on DDL
+LOCK_NAME = "automatica_schema_migrations"
+LOCK_TIMEOUT_SECONDS = 300
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _has_index(conn: Connection, table: str, columns: list, unique: bool = False) -> bool:
+    """True when an index (or unique constraint) on ``table`` starts with ``columns``."""
+    insp = inspect(conn)
+    found = [(ix["column_names"], bool(ix.get("unique"))) for ix in insp.get_indexes(table)]
+    found += [(uc["column_names"], True) for uc in insp.get_unique_constraints(table)]
+    return any(cols[: len(columns)] == columns and (is_unique or not unique) for cols, is_unique in found)
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if column not in _columns(conn, table):
+        log.info("adding %s.%s", table, column)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _add_index(conn: Connection, table: str, name: str, columns: list, unique: bool = False) -> None:
+    if _has_index(conn, table, columns, unique):
+        return
+    log.info("creating index %s on %s(%s)", name, table, ", ".join(columns))
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"))
+
+
+def _duplicate_values(conn: Connection, table: str, column: str, limit: int = 20) -> list:
+    rows = conn.execute(text(
+        f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column} HAVING COUNT(*) > 1 ORDER BY {column} LIMIT {int(limit)}"
+    ))
+    return [(value, count) for value, count in rows]
+
+
+def _legacy_columns(conn: Connection) -> None:
+    # Previously attempted with blind ALTERs on every startup
+    _add_column(conn, "orders", "wooden_crate", "BOOLEAN NULL")
+    _add_column(conn, "admin_users", "role", "VARCHAR(32) NOT NULL DEFAULT 'user'")
+    _add_column(conn, "admin_users", "is_active", "BOOLEAN NOT NULL DEFAULT 1")
+    if not _has_index(conn, "user_codes", ["code"], unique=True):
+        # The old startup ALTER failed silently on duplicates; stop with the
+        # offending codes so they can be merged, then the step re-runs on boot
+        duplicates = _duplicate_values(conn, "user_codes", "code")
+        if duplicates:
+            listed = ", ".join(f"{code!r} x{count}" for code, count in duplicates)
+            raise RuntimeError(
+                f"cannot create unique index uq_user_codes_code: duplicate user_codes.code values ({listed}); "
+                "remove or rename the duplicates and restart"
+            )
+    _add_index(conn, "user_codes", "uq_user_codes_code", ["code"], unique=True)
+
+
+def _order_list_indexes(conn: Connection) -> None:
+    # The order list filters on group_code or status (or neither) and sorts by
+    # (updated_at, id); InnoDB secondary indexes carry the primary key, so these
+    # serve the filter, the sort and the keyset cursor from one index range.
+    _add_index(conn, "orders", "ix_orders_group_code_updated_at", ["group_code", "updated_at"])
+    _add_index(conn, "orders", "ix_orders_status_updated_at", ["status", "updated_at"])
+    _add_index(conn, "orders", "ix_orders_updated_at", ["updated_at"])
+
+
+def _order_summary(conn: Connection) -> None:
+    # create_all has already created the table; fill it from existing orders
+    from .summary import rebuild
+
+    log.info("populated order_summary with %d rows", rebuild(conn))
+
+
+# (version, name, step). Append only; never renumber or edit an applied step.
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "legacy columns and user_codes unique code", _legacy_columns),
+    (2, "order list composite indexes", _order_list_indexes),
+    (3, "order_summary totals per group and status", _order_summary),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(conn: Connection) -> set:
+    from .models import SchemaVersion
+
+    return set(conn.execute(select(SchemaVersion.version)).scalars())
+
+
+def _acquire_lock(conn: Connection) -> bool:
+    if not conn.dialect.name.startswith("mysql"):
+        return False
+    got = conn.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT_SECONDS}).scalar()
+    if got != 1:
+        raise RuntimeError(f"could not acquire migration lock {LOCK_NAME!r} within {LOCK_TIMEOUT_SECONDS}s")
+    return True
+
+
+def run_migrations(engine: Engine) -> list:
+    """Apply pending migrations in order; returns the versions applied."""
+    from .models import SchemaVersion
+
+    SchemaVersion.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.rollback()
+        if all(v in done for v, _, _ in MIGRATIONS):
+            return []
+        locked = _acquire_lock(conn)
+        try:
+            # Another host may have finished while we waited for the lock
+            done = applied_versions(conn)
+            conn.commit()
+            applied = []
+            for version, name, step in MIGRATIONS:
+                if version in done:
+                    continue
+                log.info("applying schema migration %d: %s", version, name)
+                # MySQL commits DDL implicitly, so steps check the live schema
+                # instead of relying on rollback when re-run after a failure
+                step(conn)
+                conn.execute(SchemaVersion.__table__.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+                conn.commit()
+                applied.append(version)
+            return applied
+        finally:
+            if locked:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+                conn.commit()
+
+
+def main():
+    """python -m backend.migrations [status]: apply pending migrations or list them."""
+    from .db import Base, engine, db_connection_summary
+    from . import models  # noqa: F401  (register tables)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"Database: {db_connection_summary()}")
+    if sys.argv[1:] == ["status"]:
+        from .models import SchemaVersion
+
+        SchemaVersion.__table__.create(bind=engine, checkfirst=True)
+        with engine.connect() as conn:
+            done = applied_versions(conn)
+        for version, name, _ in MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending'}  {version:>3}  {name}")
+        return
+    Base.metadata.create_all(bind=engine)
+    applied = run_migrations(engine)
+    print(f"Applied {applied}" if applied else f"Schema is up to date (version {LATEST_VERSION})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Integer, String, DateTime, Float, Text, Boolean, UniqueConstraint
+from sqlalchemy import Integer, String, DateTime, Float, Text, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .db import Base
@@ -18,6 +18,11 @@ STATUSES = [
 
 class Order(Base):
     __tablename__ = "orders"
+    # Order list: filter by group_code / status, sort and seek by (updated_at, id)
+    __table_args__ = (
+        Index("ix_orders_group_code_updated_at", "group_code", "updated_at"),
+        Index("ix_orders_status_updated_at", "status", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     order_no: Mapped[str] = mapped_column(String(64), unique=True, index=True)
@@ -26,7 +31,7 @@ class Order(Base):
     shipping_fee: Mapped[float | None] = mapped_column(Float(asdecimal=False), nullable=True)
     wooden_crate: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     status: Mapped[str] = mapped_column(String(64), default=STATUSES[0])
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
@@ -68,3 +73,24 @@ class UserCode(Base):
     user_id: Mapped[int] = mapped_column(Integer, index=True)
     code: Mapped[str] = mapped_column(String(64), index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class OrderSummary(Base):
+    """Order totals per (group_code, status), maintained by backend.summary."""
+    __tablename__ = "order_summary"
+
+    group_code: Mapped[str] = mapped_column(String(64), primary_key=True)  # "" = unassigned
+    status: Mapped[str] = mapped_column(String(64), primary_key=True)
+    order_count: Mapped[int] = mapped_column(Integer, default=0)
+    total_weight: Mapped[float] = mapped_column(Float(asdecimal=False), default=0.0)
+    total_fee: Mapped[float] = mapped_column(Float(asdecimal=False), default=0.0)  # explicit shipping_fee only
+    unpriced_weight: Mapped[float] = mapped_column(Float(asdecimal=False), default=0.0)  # weight of orders without a fee
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    name: Mapped[str] = mapped_column(String(128))
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
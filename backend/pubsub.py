@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+from typing import Iterable, Optional
+
+from .rundir import prepare_run_dir
+
+
+############################################################
+# In-process pub/sub for order change events
+############################################################
+# Write paths publish small event dicts; SSE subscribers (OrderEventsHandler)
+# register interest in topics ("code", group_code) / ("order", order_no).
+# Subscriber bookkeeping and delivery happen on the IOLoop thread only;
+# publish() may be called from worker threads (import jobs) and hops onto
+# the loop with call_soon_threadsafe. With several worker processes
+# (WORKERS) each process binds a datagram socket in this run's subdirectory
+# of PUBSUB_DIR and relays the events it publishes to its siblings, so a
+# subscriber connected to any worker sees writes handled by all of them. Delivery is best effort: a
+# client that reconnects or receives an "overflow" event should refetch.
+
+PUBSUB_DIR = os.getenv("PUBSUB_DIR") or os.path.join(tempfile.gettempdir(), "automatica-pubsub")
+# Undelivered events kept per subscriber before it is told to refetch
+SSE_BUFFER = max(1, int(os.getenv("SSE_BUFFER", "100")))
+# Events per relay datagram (keeps datagrams well below the socket buffer)
+RELAY_CHUNK = 200
+RELAY_REFRESH_SECONDS = 5.0
+
+# Set by prepare_pubsub_dir() in the parent, inherited by the forked workers
+_run_dir: Optional[str] = None
+
+
+def order_event(kind: str, order: dict, previous: Optional[dict] = None) -> dict:
+    """Event payload for an order write; ``previous`` holds the old group_code/status on updates."""
+    event = {
+        "type": kind,
+        "order_no": order.get("order_no"),
+        "group_code": order.get("group_code"),
+        "status": order.get("status"),
+        "updated_at": order.get("updated_at") or datetime.utcnow().isoformat(),
+    }
+    if previous is not None:
+        event["previous_group_code"] = previous.get("group_code")
+        event["previous_status"] = previous.get("status")
+    return event
+
+
+def code_topic(group_code) -> tuple:
+    # Same convention as the order list: code "A" = orders without a group
+    return ("code", str(group_code) if group_code else "A")
+
+
+def event_topics(event: dict) -> set:
+    topics = {("order", str(event.get("order_no"))), code_topic(event.get("group_code"))}
+    if "previous_group_code" in event:
+        # Orders moved out of a group are still news for that group's subscribers
+        topics.add(code_topic(event["previous_group_code"]))
+    return topics
+
+
+class Subscription:
+    def __init__(self, topics: Iterable[tuple], maxlen: int = SSE_BUFFER):
+        self.topics = frozenset(topics)
+        self.maxlen = maxlen
+        self.overflowed = False
+        self.closed = False
+        self._events: deque = deque()
+        self._wakeup = asyncio.Event()
+
+    def push(self, event: dict) -> bool:
+        if len(self._events) >= self.maxlen:
+            # A slow reader gets one overflow notice instead of an unbounded backlog
+            self._events.clear()
+            self.overflowed = True
+            self._wakeup.set()
+            return False
+        self._events.append(event)
+        self._wakeup.set()
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        self._wakeup.set()
+
+    async def next_batch(self, timeout: float) -> list:
+        """Queued events, or [] after ``timeout`` seconds without any."""
+        if not self._events and not self.closed and not self.overflowed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._wakeup.clear()
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+
+class Broker:
+    def __init__(self):
+        self._topics: dict[tuple, set] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._relay_sock: Optional[socket.socket] = None
+        self._siblings: list[str] = []
+        self._siblings_at = 0.0
+
+    # -- subscribers (IOLoop thread) --
+
+    def subscribe(self, topics: Iterable[tuple]) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(topics)
+        for topic in sub.topics:
+            self._topics.setdefault(topic, set()).add(sub)
+        self._subscribers += 1
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        for topic in sub.topics:
+            subs = self._topics.get(topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._topics[topic]
+        self._subscribers -= 1
+        sub.close()
+
+    # -- publishing (any thread) --
+
+    @property
+    def listening(self) -> bool:
+        """False until a subscriber or the relay exists; lets publishers skip building events."""
+        return self._loop is not None
+
+    def publish(self, events: list) -> None:
+        if not events:
+            return
+        loop = self._loop
+        if loop is None:
+            # No subscriber has ever connected and no relay: nobody to tell
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._publish_local(events)
+        else:
+            loop.call_soon_threadsafe(self._publish_local, events)
+
+    def _publish_local(self, events: list) -> None:
+        self.published += len(events)
+        if self._relay_sock is not None:
+            self._relay(events)
+        self._deliver(events)
+
+    def _deliver(self, events: list) -> None:
+        if not self._topics:
+            return
+        for event in events:
+            targets = set()
+            for topic in event_topics(event):
+                targets.update(self._topics.get(topic, ()))
+            for sub in targets:
+                if sub.push(event):
+                    self.delivered += 1
+                else:
+                    self.dropped += 1
+
+    # -- cross-process relay (WORKERS > 1) --
+
+    def start_relay(self) -> None:
+        """Bind this worker's datagram socket; call in each forked worker before the IOLoop starts."""
+        import tornado.ioloop
+
+        if _run_dir is None:
+            raise RuntimeError("prepare_pubsub_dir() must run in the parent before forking")
+        io_loop = tornado.ioloop.IOLoop.current()
+        self._loop = io_loop.asyncio_loop
+        path = _socket_path(os.getpid())
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+        sock.setblocking(False)
+        self._relay_sock = sock
+        io_loop.add_handler(sock.fileno(), self._on_relay_readable, io_loop.READ)
+
+    def _sibling_paths(self) -> list:
+        now = time.monotonic()
+        if now - self._siblings_at >= RELAY_REFRESH_SECONDS:
+            own = f"{os.getpid()}.sock"
+            try:
+                names = os.listdir(_run_dir)
+            except OSError:
+                names = []
+            self._siblings = [os.path.join(_run_dir, n) for n in names if n.endswith(".sock") and n != own]
+            self._siblings_at = now
+        return self._siblings
+
+    def _relay(self, events: list) -> None:
+        for start in range(0, len(events), RELAY_CHUNK):
+            chunk = events[start:start + RELAY_CHUNK]
+            data = json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            for path in self._sibling_paths():
+                try:
+                    self._relay_sock.sendto(data, path)
+                except (FileNotFoundError, ConnectionRefusedError):
+                    # Sibling exited; forget it until the next directory refresh
+                    self._siblings_at = 0.0
+                except OSError:
+                    # Receiver's buffer is full (or datagram too large): best effort
+                    self.dropped += len(chunk)
+
+    def _on_relay_readable(self, fd, events) -> None:
+        while True:
+            try:
+                data = self._relay_sock.recv(1 << 18)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            try:
+                batch = json.loads(data)
+            except ValueError:
+                continue
+            self._deliver(batch)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._subscribers,
+            "topics": len(self._topics),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "relay": self._relay_sock is not None,
+        }
+
+
+def _socket_path(pid: int) -> str:
+    return os.path.join(_run_dir, f"{pid}.sock")
+
+
+def prepare_pubsub_dir() -> None:
+    """Create this run's relay directory under PUBSUB_DIR; call in the parent before forking.
+
+    Workers relay only to sockets in that directory, so other deployments
+    sharing PUBSUB_DIR never see this run's events.
+    """
+    global _run_dir
+    _run_dir = prepare_run_dir(PUBSUB_DIR)
+
+
+BROKER = Broker()
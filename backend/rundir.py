@@ -0,0 +1,44 @@
+import os
+import shutil
+from typing import Optional
+
+
+############################################################
+# Per-run scratch directories
+############################################################
+# Pre-forked workers share small files (relay sockets, metrics snapshots,
+# import job state) through a directory under /tmp by default. Several
+# deployments on one host may use the same base directory, so each run works
+# in its own subdirectory named after the process that prepared it (the
+# pre-fork parent): runs never read or delete each other's files, and
+# subdirectories whose owner has exited are removed when a new run starts.
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_dir(base: str, pid: Optional[int] = None) -> str:
+    return os.path.join(base, str(pid or os.getpid()))
+
+
+def prepare_run_dir(base: str) -> str:
+    """Create an empty ``base/<pid>`` for this process's run and drop those of exited runs."""
+    own = os.getpid()
+    try:
+        names = os.listdir(base)
+    except OSError:
+        names = []
+    for name in names:
+        # A directory named after our pid is left over from an earlier process
+        if name.isdigit() and (int(name) == own or not pid_alive(int(name))):
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+    path = run_dir(base, own)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -1,34 +1,59 @@
+import asyncio
+import base64
+import email.utils
+import hashlib
+import hmac
 import json
 import os
 import random
+import re
 import string
 import tempfile
+import time
+from contextlib import aclosing
 from datetime import datetime, timedelta, timezone
-from io import BytesIO
 from typing import List, Optional
 
+import tornado.escape
+import tornado.httpserver
 import tornado.ioloop
+import tornado.iostream
+import tornado.netutil
+import tornado.process
 import tornado.web
 from jose import JWTError
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.exc import IntegrityError
 
 # Support running both as package (python -m backend.server) and as script (python backend/server.py)
 try:
-    from .auth import authenticate_admin, create_access_token, verify_token, ensure_default_admin, verify_password, get_password_hash
-    from .db import SessionLocal, init_db
+    from .cache import TTLCache
+    from .auth import authenticate_admin_async, create_access_token, verify_token, ensure_default_admin, verify_password_async, get_password_hash_async
+    from .db import dispose_engine_after_fork, pool_stats, replica_engine, init_db
+    from .summary import SummaryDelta, read_summary
+    from .executor import ExecutorBusy, executor_stats, run_blocking, run_in_read_session, run_in_session, stream_partitions
+    from .exporter import EXPORT_BATCH_SIZE, EXPORT_CHUNK_BYTES, EXPORT_COLUMNS, EXPORT_FORMATS, STREAM_ENCODERS, XlsxExportWriter, csv_header
     from .models import Order, STATUSES, Setting, AnnouncementHistory, AdminUser, UserCode
-    from .importer import import_excel
-    from openpyxl import Workbook
+    from .metrics import METRICS_FLUSH_SECONDS, log_query_heavy_request, observe_export, observe_request, observe_stream, render_all, prepare_shared_dir, start_request, write_snapshot
+    from .jobs import IMPORT_EXECUTOR, get_import_job_status, prepare_job_dir, submit_import_job
+    from .pubsub import BROKER, code_topic, order_event, prepare_pubsub_dir
+    from .uploads import MultipartFileSink, UploadError, multipart_boundary
 except Exception:
     import sys, pathlib
     ROOT = pathlib.Path(__file__).resolve().parents[1]
     if str(ROOT) not in sys.path:
         sys.path.insert(0, str(ROOT))
-    from backend.auth import authenticate_admin, create_access_token, verify_token, ensure_default_admin, verify_password, get_password_hash
-    from backend.db import SessionLocal, init_db
+    from backend.cache import TTLCache
+    from backend.auth import authenticate_admin_async, create_access_token, verify_token, ensure_default_admin, verify_password_async, get_password_hash_async
+    from backend.db import dispose_engine_after_fork, pool_stats, replica_engine, init_db
+    from backend.summary import SummaryDelta, read_summary
+    from backend.executor import ExecutorBusy, executor_stats, run_blocking, run_in_read_session, run_in_session, stream_partitions
+    from backend.exporter import EXPORT_BATCH_SIZE, EXPORT_CHUNK_BYTES, EXPORT_COLUMNS, EXPORT_FORMATS, STREAM_ENCODERS, XlsxExportWriter, csv_header
     from backend.models import Order, STATUSES, Setting, AnnouncementHistory, AdminUser, UserCode
-    from backend.importer import import_excel
-    from openpyxl import Workbook
+    from backend.metrics import METRICS_FLUSH_SECONDS, log_query_heavy_request, observe_export, observe_request, observe_stream, render_all, prepare_shared_dir, start_request, write_snapshot
+    from backend.jobs import IMPORT_EXECUTOR, get_import_job_status, prepare_job_dir, submit_import_job
+    from backend.pubsub import BROKER, code_topic, order_event, prepare_pubsub_dir
+    from backend.uploads import MultipartFileSink, UploadError, multipart_boundary
 
 
 def get_allowed_origins() -> List[str]:
@@ -50,6 +75,45 @@ def origin_allowed(origin: Optional[str]) -> bool:
 
 STRICT_ORIGIN = os.getenv("STRICT_ORIGIN", "true").lower() in {"1", "true", "yes"}
 FORCE_HTTPS = os.getenv("FORCE_HTTPS", "false").lower() in {"1", "true", "yes"}
+# Resolved principals keyed by token subject; bounds how long role changes take
+# to reach other worker processes (the local process is invalidated directly).
+PRINCIPAL_CACHE = TTLCache(
+    maxsize=int(os.getenv("AUTH_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "60")),
+    name="principals",
+)
+# Decoded site settings (bulletin, contacts, invite codes); writes in this
+# process invalidate it, the TTL bounds staleness in other workers.
+SETTINGS_CACHE = TTLCache(
+    maxsize=1,
+    ttl=float(os.getenv("SETTINGS_CACHE_TTL", "30")),
+    name="settings",
+)
+# Bearer token for /orderapi/metrics scrapers; unset = admin login required
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
+# Encoded by-no lookup responses keyed by order_no. Local writes and imports
+# invalidate entries; the TTL bounds staleness elsewhere. Unknown numbers are
+# cached for ORDER_CACHE_MISS_TTL only, since they usually arrive soon by import.
+ORDER_CACHE = TTLCache(
+    maxsize=int(os.getenv("ORDER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ORDER_CACHE_TTL", "30")),
+    name="orders",
+)
+ORDER_CACHE_MISS_TTL = float(os.getenv("ORDER_CACHE_MISS_TTL", "3"))
+# Most order numbers accepted by one POST /orderapi/orders/lookup
+LOOKUP_MAX_ORDERS = int(os.getenv("LOOKUP_MAX_ORDERS", "100"))
+# Order event streams (/orderapi/orders/events): comment line interval that keeps
+# proxies from closing idle streams, topics per stream, open streams per process
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "25"))
+SSE_MAX_TOPICS = int(os.getenv("SSE_MAX_TOPICS", "50"))
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "5000"))
+# Upper bound for streamed Excel uploads (bytes)
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+# Rate for computed shipping fee when order.shipping_fee is NULL (read once at startup)
+RATE_PER_KG = float(os.getenv("RATE_PER_KG", "0") or 0)
+# DATETIME columns only keep whole seconds on MySQL, so two writes in the same
+# second can share a validator; data this fresh is never answered with 304.
+VALIDATOR_SETTLE = timedelta(seconds=2)
 
 
 def parse_date_param(value: str) -> Optional[datetime]:
@@ -89,6 +153,172 @@ def parse_bool_param(value, default: bool = False) -> bool:
     return default
 
 
+def encode_cursor(updated_at: datetime, order_id: int) -> str:
+    """Opaque keyset cursor for the (updated_at, id) sort order."""
+    raw = json.dumps([updated_at.isoformat(), order_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(value: str):
+    """Return (updated_at, id) or None when the cursor is malformed."""
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        updated_raw, order_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        updated_at = datetime.fromisoformat(updated_raw)
+    except Exception:
+        return None
+    # Cursors are client-controlled: only accept what encode_cursor produces,
+    # so a tampered value cannot reach the query as an out-of-range id
+    if type(order_id) is not int or not 0 <= order_id < 2 ** 63 or updated_at.tzinfo is not None:
+        return None
+    return updated_at, order_id
+
+
+def apply_order_filters(q, filters: dict):
+    code = filters.get("code")
+    if code == "A":
+        q = q.filter((Order.group_code == None) | (Order.group_code == ""))
+    elif code:
+        q = q.filter(Order.group_code == code)
+    if filters.get("status"):
+        q = q.filter(Order.status == filters["status"])
+    if filters.get("start_dt"):
+        q = q.filter(Order.updated_at >= filters["start_dt"])
+    if filters.get("end_dt"):
+        q = q.filter(Order.updated_at < (filters["end_dt"] + timedelta(days=1)))
+    return q
+
+
+def aggregate_order_totals(q) -> dict:
+    """COUNT / SUM(weight) / SUM(fee) / MAX(updated_at) over a filtered Order query in a single SQL round trip."""
+    fee_expr = func.coalesce(Order.shipping_fee, func.coalesce(Order.weight_kg, 0.0) * RATE_PER_KG)
+    count, weight, fee, last_updated = q.with_entities(
+        func.count(Order.id),
+        func.sum(Order.weight_kg),
+        func.sum(fee_expr),
+        func.max(Order.updated_at),
+    ).one()
+    if isinstance(last_updated, str):
+        # SQLite returns aggregate datetimes as text
+        last_updated = datetime.fromisoformat(last_updated)
+    return {
+        "count": int(count or 0),
+        "total_weight": round(float(weight or 0.0), 3),
+        "total_shipping_fee": round(float(fee or 0.0), 2),
+        "last_updated_at": last_updated.isoformat() if last_updated else None,
+    }
+
+
+def make_etag(*parts) -> str:
+    """Weak entity tag over the given version parts (not the serialized body)."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def page_order_totals(orders: List[dict]) -> dict:
+    total_weight = sum([o["weight_kg"] or 0.0 for o in orders])
+    total_fee = 0.0
+    for o in orders:
+        if o["shipping_fee"] is not None:
+            total_fee += float(o["shipping_fee"])
+        else:
+            total_fee += (o["weight_kg"] or 0.0) * RATE_PER_KG
+    return {
+        "count": len(orders),
+        "total_weight": round(total_weight, 3),
+        "total_shipping_fee": round(total_fee, 2),
+    }
+
+
+def order_to_dict(o: Order) -> dict:
+    return {
+        "id": o.id,
+        "order_no": o.order_no,
+        "group_code": o.group_code,
+        "weight_kg": o.weight_kg,
+        "shipping_fee": o.shipping_fee,
+        "wooden_crate": o.wooden_crate,
+        "status": o.status,
+        "updated_at": o.updated_at.isoformat() if o.updated_at else None,
+    }
+
+
+def cache_order_entry(order_no: str, entry: tuple, generation: int) -> None:
+    # Skipped when a write or import invalidated ORDER_CACHE after ``generation`` was taken
+    ORDER_CACHE.set(order_no, entry, ttl=ORDER_CACHE_MISS_TTL if entry[0] is None else None, generation=generation)
+
+
+def order_cache_entry(o: Optional[Order]) -> tuple:
+    """ORDER_CACHE value: (encoded body, etag, last_modified); (None, None, None) for unknown numbers."""
+    if o is None:
+        return None, None, None
+    body = tornado.escape.json_encode(order_to_dict(o)).encode("utf-8")
+    etag = make_etag("order", o.id, o.updated_at.isoformat() if o.updated_at else "")
+    return body, etag, o.updated_at
+
+
+SITE_SETTING_KEYS = ("bulletin_html", "bulletin_title", "admin_contacts", "register_invite_codes")
+
+
+def _decode_json_list(value: Optional[str]) -> list:
+    if not value:
+        return []
+    try:
+        data = json.loads(value)
+    except Exception:
+        return []
+    return data if isinstance(data, list) else []
+
+
+def load_site_settings(db) -> dict:
+    """Read all public site settings with one query and decode the JSON values.
+
+    Returns ``{"data", "etag", "last_modified"}``; ``data`` is the public
+    announcement payload, the other two validate conditional requests.
+    """
+    rows = {s.key: s for s in db.query(Setting).filter(Setting.key.in_(SITE_SETTING_KEYS)).all()}
+    last_modified = max((s.updated_at for s in rows.values() if s.updated_at), default=None)
+    s_html = rows.get("bulletin_html")
+    s_title = rows.get("bulletin_title")
+    updated = None
+    for s in (s_html, s_title):
+        if s and s.updated_at:
+            if not updated or s.updated_at > updated:
+                updated = s.updated_at
+    contacts = []
+    for item in _decode_json_list(rows["admin_contacts"].value if "admin_contacts" in rows else None):
+        if not isinstance(item, dict):
+            continue
+        contacts.append({
+            'icon': str(item.get('icon') or ''),
+            'label': str(item.get('label') or ''),
+            'value': str(item.get('value') or ''),
+            'href': str(item.get('href') or ''),
+        })
+    invites = _decode_json_list(rows["register_invite_codes"].value if "register_invite_codes" in rows else None)
+    data = {
+        "html": s_html.value if s_html else "",
+        "title": s_title.value if s_title and s_title.value else "公告栏",
+        "updated_at": updated.isoformat() if updated else None,
+        "contacts": contacts,
+        "invite_codes": [str(item).strip() for item in invites if str(item).strip()],
+    }
+    # Hashed once per cache fill, so the tag follows content rather than timestamps
+    etag = make_etag("settings", json.dumps(data, sort_keys=True, ensure_ascii=False))
+    return {"data": data, "etag": etag, "last_modified": last_modified}
+
+
+async def get_site_settings() -> dict:
+    """Cached ``load_site_settings``; callers must treat the result as read-only."""
+    data = SETTINGS_CACHE.get("site")
+    if data is None:
+        # A settings PUT that invalidates during the read keeps its change
+        generation = SETTINGS_CACHE.generation()
+        data = await run_in_read_session(load_site_settings)
+        SETTINGS_CACHE.set("site", data, generation=generation)
+    return data
+
+
 class BaseHandler(tornado.web.RequestHandler):
     def set_default_headers(self):
         origin = self.request.headers.get("Origin")
@@ -107,8 +337,8 @@ class BaseHandler(tornado.web.RequestHandler):
         # Only enforce for API endpoints; allow HTML like /admin
         if not self.request.path.startswith("/orderapi/"):
             return True
-        # Allow health without origin checks
-        if self.request.path == "/orderapi/health":
+        # Allow health and metrics scrapes without origin checks
+        if self.request.path in ("/orderapi/health", "/orderapi/metrics"):
             return True
         if not STRICT_ORIGIN:
             return True
@@ -119,7 +349,12 @@ class BaseHandler(tornado.web.RequestHandler):
             return False
         return True
 
+    # Set by handlers once they start a long-lived stream (SSE); such responses
+    # are measured by observe_stream instead of the request latency metrics
+    _streaming = False
+
     def prepare(self):
+        self._stats = start_request(f"{type(self).__name__} {self.request.method} {self.request.path}")
         # HTTPS redirect if enabled
         if FORCE_HTTPS:
             # Tornado behind a proxy will see http; trust X-Forwarded-Proto
@@ -140,6 +375,33 @@ class BaseHandler(tornado.web.RequestHandler):
         if not self.check_origin_enforced():
             return
 
+    def finish(self, chunk=None):
+        stats = getattr(self, "_stats", None)
+        if stats is not None and not self._streaming and not self._headers_written:
+            self.set_header(
+                "Server-Timing",
+                f"db;dur={stats.query_seconds * 1000:.1f};count={stats.query_count}, "
+                f"app;dur={self.request.request_time() * 1000:.1f}",
+            )
+        return super().finish(chunk)
+
+    def on_finish(self):
+        stats = getattr(self, "_stats", None)
+        if self._streaming:
+            # Connection lifetime, not latency: own series, no query-heavy warning
+            observe_stream(type(self).__name__, self.request.method, self.get_status(), self.request.request_time())
+            return
+        observe_request(
+            type(self).__name__,
+            self.request.method,
+            self.get_status(),
+            self.request.request_time(),
+            stats.db_seconds if stats else 0.0,
+            stats.query_count if stats else 0,
+        )
+        if stats is not None:
+            log_query_heavy_request(stats)
+
     def options(self, *args, **kwargs):
         # CORS preflight
         self.set_status(204)
@@ -150,6 +412,85 @@ class BaseHandler(tornado.web.RequestHandler):
         self.set_status(204)
         self.finish()
 
+    def parse_order_filters(self) -> Optional[dict]:
+        """Read code/status/start_date/end_date; responds 400 and returns None when invalid."""
+        code = self.get_query_argument("code", default="").strip()
+        status_filter = self.get_query_argument("status", default="").strip()
+        start_raw = self.get_query_argument("start_date", default="").strip()
+        end_raw = self.get_query_argument("end_date", default="").strip()
+        if status_filter and status_filter not in STATUSES:
+            self.set_status(400)
+            self.finish({"detail": "状态非法"})
+            return None
+        start_dt = parse_date_param(start_raw)
+        if start_raw and not start_dt:
+            self.set_status(400)
+            self.finish({"detail": "开始日期格式不正确"})
+            return None
+        end_dt = parse_date_param(end_raw)
+        if end_raw and not end_dt:
+            self.set_status(400)
+            self.finish({"detail": "结束日期格式不正确"})
+            return None
+        if start_dt and end_dt and start_dt > end_dt:
+            self.set_status(400)
+            self.finish({"detail": "开始日期不能晚于结束日期"})
+            return None
+        return {"code": code, "status": status_filter, "start_dt": start_dt, "end_dt": end_dt}
+
+    def is_not_modified(self, etag: str, last_modified: Optional[datetime] = None) -> bool:
+        """True when the client's cached copy (If-None-Match / If-Modified-Since) is current.
+
+        Only reads request headers, so it can run inside pooled DB work to skip
+        fetching rows that would be thrown away.
+        """
+        if last_modified and datetime.utcnow() - last_modified < VALIDATOR_SETTLE:
+            return False
+        if_none_match = self.request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = re.findall(r'\*|(?:W/)?"[^"]*"', if_none_match)
+            ours = etag[2:] if etag.startswith("W/") else etag
+            return any(t == "*" or (t[2:] if t.startswith("W/") else t) == ours for t in tags)
+        if_modified_since = self.request.headers.get("If-Modified-Since")
+        if if_modified_since and last_modified:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            return last_modified.replace(microsecond=0) <= since
+        return False
+
+    def set_validators(self, etag: str, last_modified: Optional[datetime] = None):
+        # An explicit Etag also stops Tornado from hashing the body in finish()
+        self.set_header("Etag", etag)
+        if last_modified:
+            self.set_header("Last-Modified", last_modified)
+        # Cache but always revalidate: polling clients must see new data immediately
+        self.set_header("Cache-Control", "no-cache")
+
+    def not_modified(self, etag: str, last_modified: Optional[datetime] = None):
+        self.set_validators(etag, last_modified)
+        self.set_status(304)
+        self.finish()
+
+    def respond(self, status: int, body=None):
+        """Finish with ``status`` and an optional JSON body (result of pooled DB work)."""
+        self.set_status(status)
+        if body is None:
+            self.finish()
+        else:
+            self.finish(body)
+
+    def write_error(self, status_code: int, **kwargs):
+        exc_info = kwargs.get("exc_info")
+        if exc_info and isinstance(exc_info[1], ExecutorBusy):
+            self.set_status(503)
+            self.finish({"detail": "服务繁忙，请稍后再试"})
+            return
+        super().write_error(status_code, **kwargs)
+
 
 def require_bearer(handler: BaseHandler) -> Optional[str]:
     auth = handler.request.headers.get("Authorization", "")
@@ -172,55 +513,134 @@ def require_bearer(handler: BaseHandler) -> Optional[str]:
     return None
 
 
-def get_current_user(handler: BaseHandler):
+async def get_current_user(handler: BaseHandler):
     """Return dict with username, role, user_id, is_env_superadmin."""
     sub = require_bearer(handler)
     if not sub:
         return None
+    cached = PRINCIPAL_CACHE.get(sub)
+    if cached is not None:
+        return dict(cached)
+    # Taken before the lookup so a role change committed meanwhile is not undone
+    generation = PRINCIPAL_CACHE.generation()
+
     # Try DB lookup
-    db = SessionLocal()
-    try:
+    def lookup(db):
         u = db.query(AdminUser).filter(AdminUser.username == sub).one_or_none()
         if u:
             return {"username": u.username, "role": (u.role or "user"), "user_id": u.id, "is_env_superadmin": False}
-    finally:
-        db.close()
-    # If not in DB, treat env-login as superadmin
-    return {"username": sub, "role": "superadmin", "user_id": None, "is_env_superadmin": True}
+        return None
+
+    user = await run_in_session(lookup)
+    if not user:
+        # If not in DB, treat env-login as superadmin
+        user = {"username": sub, "role": "superadmin", "user_id": None, "is_env_superadmin": True}
+    PRINCIPAL_CACHE.set(sub, dict(user), generation=generation)
+    return user
 
 
 class HealthHandler(BaseHandler):
     def get(self):
-        self.write({"ok": True, "time": datetime.utcnow().isoformat()})
+        self.write({
+            "ok": True,
+            "time": datetime.utcnow().isoformat(),
+            "executor": executor_stats(),
+            "import_executor": IMPORT_EXECUTOR.stats(),
+            "db_pool": pool_stats(),
+            "db_replica_pool": pool_stats(replica_engine) if replica_engine is not None else None,
+            "caches": {"principals": PRINCIPAL_CACHE.stats(), "settings": SETTINGS_CACHE.stats(), "orders": ORDER_CACHE.stats()},
+            "pubsub": BROKER.stats(),
+        })
+
+
+def _metrics_samples() -> list:
+    """Scrape-time (name, kind, help, labels, value) samples; monotonic totals are counters."""
+    pid = {"pid": str(os.getpid())}
+    samples = []
+    for pool_name, stats in (("db", executor_stats()), ("import", IMPORT_EXECUTOR.stats())):
+        labels = {**pid, "pool": pool_name}
+        samples += [
+            ("automatica_executor_active", "gauge", "Busy worker threads.", labels, stats["active"]),
+            ("automatica_executor_queued", "gauge", "Calls waiting for a worker thread.", labels, stats["queued"]),
+            ("automatica_executor_rejected_total", "counter", "Calls rejected because the queue was full.", labels, stats["rejected"]),
+        ]
+    pools = [("primary", pool_stats())]
+    if replica_engine is not None:
+        pools.append(("replica", pool_stats(replica_engine)))
+    for db_name, stats in pools:
+        labels = {**pid, "db": db_name}
+        samples += [
+            ("automatica_db_pool_size", "gauge", "Configured connection pool size.", labels, stats.get("size")),
+            ("automatica_db_pool_checked_out", "gauge", "Connections currently checked out.", labels, stats.get("checked_out")),
+            ("automatica_db_pool_overflow", "gauge", "Connections open beyond the pool size.", labels, stats.get("overflow")),
+            ("automatica_db_pool_checkouts_total", "counter", "Connection checkouts since the pool was created.", labels, stats.get("checkouts")),
+            ("automatica_db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.", labels, stats.get("timeouts")),
+            ("automatica_db_pool_wait_seconds_total", "counter", "Total time spent waiting for connections.", labels, stats.get("wait_seconds_total")),
+        ]
+    for cache in (PRINCIPAL_CACHE, SETTINGS_CACHE, ORDER_CACHE):
+        stats = cache.stats()
+        labels = {**pid, "cache": cache.name}
+        samples += [
+            ("automatica_cache_hits_total", "counter", "Cache hits since start.", labels, stats["hits"]),
+            ("automatica_cache_misses_total", "counter", "Cache misses since start.", labels, stats["misses"]),
+            ("automatica_cache_size", "gauge", "Entries currently cached.", labels, stats["size"]),
+        ]
+    stats = BROKER.stats()
+    samples += [
+        ("automatica_sse_subscribers", "gauge", "Open order event streams.", pid, stats["subscribers"]),
+        ("automatica_pubsub_events_published_total", "counter", "Order events published by this process.", pid, stats["published"]),
+        ("automatica_pubsub_events_delivered_total", "counter", "Order events queued to subscribers.", pid, stats["delivered"]),
+        ("automatica_pubsub_events_dropped_total", "counter", "Order events dropped (slow subscriber or relay buffer full).", pid, stats["dropped"]),
+    ]
+    return samples
+
+
+class MetricsHandler(BaseHandler):
+    async def get(self):
+        if METRICS_TOKEN:
+            scheme, _, token = self.request.headers.get("Authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), METRICS_TOKEN):
+                self.set_status(401); self.finish({"detail": "未授权"}); return
+        else:
+            cu = await get_current_user(self)
+            if not cu:
+                self.set_status(401); self.finish({"detail": "未授权"}); return
+            if cu["role"] not in ("admin", "superadmin"):
+                self.set_status(403); self.finish({"detail": "无权限"}); return
+        body = await run_blocking(render_all, _metrics_samples())
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.finish(body)
 
 
 class LoginHandler(BaseHandler):
-    def post(self):
+    async def post(self):
         try:
             payload = json.loads(self.request.body or b"{}")
         except Exception:
             self.set_status(400); self.finish({"detail": "Invalid JSON"}); return
         username = (payload.get("username") or "").strip()
         password = payload.get("password") or ""
-        if not authenticate_admin(username, password):
+        if not await authenticate_admin_async(username, password):
             self.set_status(401); self.finish({"detail": "用户名或密码错误"}); return
+
         # Determine role from DB if exists; else superadmin for env-login bootstrap
-        db = SessionLocal()
-        role = "superadmin"
-        try:
+        def lookup(db):
             u = db.query(AdminUser).filter(AdminUser.username == username).one_or_none()
             if u:
                 if not u.is_active:
-                    self.set_status(403); self.finish({"detail": "账户已被禁用，请联系管理员"}); return
-                role = u.role or "user"
-        finally:
-            db.close()
+                    return None
+                return u.role or "user"
+            return "superadmin"
+
+        role = await run_in_session(lookup)
+        if role is None:
+            self.set_status(403); self.finish({"detail": "账户已被禁用，请联系管理员"}); return
         token = create_access_token(subject=username, role=role)
         self.write({"access_token": token, "token_type": "bearer", "role": role})
 
 
 class RegisterHandler(BaseHandler):
-    def post(self):
+    async def post(self):
         try:
             payload = json.loads(self.request.body or b"{}")
         except Exception:
@@ -233,95 +653,84 @@ class RegisterHandler(BaseHandler):
             self.set_status(400); self.finish({"detail": "缺少用户名或密码"}); return
         if not invite_code:
             self.set_status(400); self.finish({"detail": "缺少邀请码"}); return
-        db = SessionLocal()
-        try:
-            s_invites = db.query(Setting).filter(Setting.key == 'register_invite_codes').one_or_none()
-            invites = []
-            if s_invites and s_invites.value:
-                try:
-                    data = json.loads(s_invites.value)
-                    if isinstance(data, list):
-                        invites = [str(item).strip() for item in data if str(item).strip()]
-                except Exception:
-                    invites = []
-            if not invites or invite_code not in invites:
-                self.set_status(403); self.finish({"detail": "邀请码无效"}); return
+
+        invites = (await get_site_settings())["data"]["invite_codes"]
+        if not invites or invite_code not in invites:
+            self.set_status(403); self.finish({"detail": "邀请码无效"}); return
+
+        def check(db):
             exists = db.query(AdminUser).filter(AdminUser.username == username).one_or_none()
             if exists:
-                self.set_status(409); self.finish({"detail": "用户名已存在"}); return
-            from .auth import get_password_hash
-            u = AdminUser(username=username, password_hash=get_password_hash(password), role="user", is_active=True)
-            db.add(u); db.flush()
-            for c in codes:
-                s = str(c or '').strip()
-                if s:
-                    db.add(UserCode(user_id=u.id, code=s))
-            db.commit()
+                return 409, {"detail": "用户名已存在"}
+            return None
+
+        # Validate before hashing so rejected requests cost no pbkdf2 work
+        rejected = await run_in_session(check)
+        if rejected:
+            self.respond(*rejected); return
+        password_hash = await get_password_hash_async(password)
+
+        def work(db):
+            try:
+                u = AdminUser(username=username, password_hash=password_hash, role="user", is_active=True)
+                db.add(u); db.flush()
+                for c in codes:
+                    s = str(c or '').strip()
+                    if s:
+                        db.add(UserCode(user_id=u.id, code=s))
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return 409, {"detail": "用户名已存在"}
             token = create_access_token(subject=username, role="user")
-            self.set_status(201)
-            self.write({"access_token": token, "token_type": "bearer", "role": "user"})
-        finally:
-            db.close()
+            return 201, {"access_token": token, "token_type": "bearer", "role": "user"}
+
+        result = await run_in_session(work)
+        PRINCIPAL_CACHE.delete(username)
+        self.respond(*result)
 
 
 class UsernameCheckHandler(BaseHandler):
-    def get(self):
+    async def get(self):
         username = self.get_query_argument("username", default="").strip()
         if not username:
             self.set_status(400)
             self.finish({"detail": "缺少用户名"})
             return
-        db = SessionLocal()
-        try:
-            exists = db.query(AdminUser).filter(AdminUser.username == username).one_or_none()
-            self.write({"available": exists is None})
-        finally:
-            db.close()
+
+        def work(db):
+            return db.query(AdminUser).filter(AdminUser.username == username).one_or_none() is None
+
+        self.write({"available": await run_in_session(work)})
 
 
 class RandomUsernameHandler(BaseHandler):
-    def get(self):
+    async def get(self):
         prefix_raw = self.get_query_argument("prefix", default="user").strip()
         filtered = ''.join(ch for ch in prefix_raw if ch.isalnum())
         prefix = (filtered or 'user').lower()
-        db = SessionLocal()
-        try:
+
+        def work(db):
             for _ in range(80):
                 suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
                 candidate = f"{prefix}{suffix}"
                 exists = db.query(AdminUser).filter(AdminUser.username == candidate).one_or_none()
                 if not exists:
-                    self.write({"username": candidate})
-                    return
-            self.set_status(503)
-            self.finish({"detail": "暂时无法生成唯一用户名，请稍后再试"})
-        finally:
-            db.close()
+                    return candidate
+            return None
+
+        candidate = await run_in_session(work)
+        if candidate:
+            self.write({"username": candidate})
+            return
+        self.set_status(503)
+        self.finish({"detail": "暂时无法生成唯一用户名，请稍后再试"})
 
 
 class OrdersHandler(BaseHandler):
-    def get(self):
-        code = self.get_query_argument("code", default=None)
-        status_filter = self.get_query_argument("status", default="").strip()
-        start_raw = self.get_query_argument("start_date", default="").strip()
-        end_raw = self.get_query_argument("end_date", default="").strip()
-        if status_filter and status_filter not in STATUSES:
-            self.set_status(400)
-            self.finish({"detail": "状态非法"})
-            return
-        start_dt = parse_date_param(start_raw)
-        if start_raw and not start_dt:
-            self.set_status(400)
-            self.finish({"detail": "开始日期格式不正确"})
-            return
-        end_dt = parse_date_param(end_raw)
-        if end_raw and not end_dt:
-            self.set_status(400)
-            self.finish({"detail": "结束日期格式不正确"})
-            return
-        if start_dt and end_dt and start_dt > end_dt:
-            self.set_status(400)
-            self.finish({"detail": "开始日期不能晚于结束日期"})
+    async def get(self):
+        filters = self.parse_order_filters()
+        if filters is None:
             return
         try:
             page = max(1, int(self.get_query_argument("page", default="1")))
@@ -329,59 +738,74 @@ class OrdersHandler(BaseHandler):
             size = 1 if size < 1 else (200 if size > 200 else size)
         except Exception:
             page, size = 1, 20
-        db = SessionLocal()
-        try:
-            q = db.query(Order)
-            if code == "A":
-                q = q.filter((Order.group_code == None) | (Order.group_code == ""))
-            elif code:
-                q = q.filter(Order.group_code == code)
-            if status_filter:
-                q = q.filter(Order.status == status_filter)
-            if start_dt:
-                q = q.filter(Order.updated_at >= start_dt)
-            if end_dt:
-                q = q.filter(Order.updated_at < (end_dt + timedelta(days=1)))
-            total_count = q.count()
-            orders = q.order_by(Order.updated_at.desc()).offset((page-1)*size).limit(size).all()
-            total_weight = sum([o.weight_kg or 0.0 for o in orders])
-            rate = float(os.getenv("RATE_PER_KG", "0"))
-            total_fee = 0.0
-            for o in orders:
-                if o.shipping_fee is not None:
-                    total_fee += float(o.shipping_fee)
-                else:
-                    total_fee += (o.weight_kg or 0.0) * rate
-
-            def to_dict(o: Order):
-                return {
-                    "id": o.id,
-                    "order_no": o.order_no,
-                    "group_code": o.group_code,
-                    "weight_kg": o.weight_kg,
-                    "shipping_fee": o.shipping_fee,
-                    "wooden_crate": o.wooden_crate,
-                    "status": o.status,
-                    "updated_at": o.updated_at.isoformat() if o.updated_at else None,
-                }
-
-            self.write({
-                "orders": [to_dict(o) for o in orders],
-                "totals": {
-                    "count": total_count,
-                    "total_weight": round(total_weight, 3),
-                    "total_shipping_fee": round(total_fee, 2),
-                },
-                "total": total_count,
-                "page": page,
-                "page_size": size,
-                "pages": (total_count + size - 1) // size,
-            })
-        finally:
-            db.close()
-
-    def post(self):
-        cu = get_current_user(self)
+        # Keyset mode: any `cursor` argument (empty = first page) switches from
+        # OFFSET paging to seeking on (updated_at, id), so deep pages cost the same as page 1.
+        cursor_raw = self.get_query_argument("cursor", default=None)
+        keyset = cursor_raw is not None
+        after = None
+        if cursor_raw:
+            after = decode_cursor(cursor_raw.strip())
+            if after is None:
+                self.set_status(400)
+                self.finish({"detail": "cursor 无效"})
+                return
+        # with_count=0 skips the COUNT(*) over the filtered set
+        with_count = parse_bool_param(self.get_query_argument("with_count", default=None), default=True)
+
+        def work(db):
+            q = apply_order_filters(db.query(Order), filters)
+            totals = aggregate_order_totals(q) if with_count else None
+            etag = None
+            if totals is not None:
+                # Count + sums + newest update identify the filtered set, and the
+                # URL pins the page; answer repeat polls before reading any rows.
+                etag = make_etag("orders", totals["count"], totals["total_weight"], totals["total_shipping_fee"], totals["last_updated_at"])
+                last = datetime.fromisoformat(totals["last_updated_at"]) if totals["last_updated_at"] else None
+                # ETag only: deleting an order leaves the newest updated_at unchanged,
+                # so If-Modified-Since cannot tell the list changed. The date only
+                # holds back 304s while writes inside the settle window may land.
+                settled = last is None or datetime.utcnow() - last >= VALIDATOR_SETTLE
+                if settled and self.is_not_modified(etag):
+                    return totals, None, None, etag
+            ordered = q.order_by(Order.updated_at.desc(), Order.id.desc())
+            if keyset:
+                if after:
+                    ordered = ordered.filter(tuple_(Order.updated_at, Order.id) < tuple_(*after))
+                rows = ordered.limit(size + 1).all()
+                next_cursor = None
+                if len(rows) > size:
+                    rows = rows[:size]
+                    next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+                return totals, [order_to_dict(o) for o in rows], next_cursor, etag
+            orders = ordered.offset((page-1)*size).limit(size).all()
+            return totals, [order_to_dict(o) for o in orders], None, etag
+
+        totals, orders, next_cursor, etag = await run_in_read_session(work)
+        if orders is None:
+            self.not_modified(etag)
+            return
+        if etag:
+            self.set_validators(etag)
+        page_totals = page_order_totals(orders)
+        total_count = totals["count"] if totals else None
+
+        body = {
+            "orders": orders,
+            # `totals` covers the whole filtered set; falls back to the page when with_count=0
+            "totals": totals or page_totals,
+            "page_totals": page_totals,
+            "total": total_count,
+            "page_size": size,
+            "pages": (total_count + size - 1) // size if total_count is not None else None,
+        }
+        if keyset:
+            body["next_cursor"] = next_cursor
+        else:
+            body["page"] = page
+        self.write(body)
+
+    async def post(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] not in ("admin", "superadmin"):
@@ -416,11 +840,10 @@ class OrdersHandler(BaseHandler):
         except Exception:
             self.set_status(400); self.finish({"detail": "shipping_fee 必须为数字"}); return
 
-        db = SessionLocal()
-        try:
+        def work(db):
             exists = db.query(Order).filter(Order.order_no == order_no).one_or_none()
             if exists:
-                self.set_status(409); self.finish({"detail": "订单已存在"}); return
+                return 409, {"detail": "订单已存在"}
             now = datetime.utcnow()
             o = Order(
                 order_no=order_no,
@@ -433,45 +856,43 @@ class OrdersHandler(BaseHandler):
                 updated_at=now,
             )
             db.add(o)
+            delta = SummaryDelta()
+            delta.add_order(o)
+            delta.apply(db)
             db.commit()
             db.refresh(o)
-            self.set_status(201)
-            self.write({
-                "id": o.id,
-                "order_no": o.order_no,
-                "group_code": o.group_code,
-                "weight_kg": o.weight_kg,
-                "shipping_fee": o.shipping_fee,
-                "wooden_crate": o.wooden_crate,
-                "status": o.status,
-                "updated_at": o.updated_at.isoformat() if o.updated_at else None,
-            })
-        finally:
-            db.close()
+            return 201, order_to_dict(o)
 
+        result = await run_in_session(work)
+        ORDER_CACHE.delete(order_no)
+        if result[0] == 201:
+            BROKER.publish([order_event("created", result[1])])
+        self.respond(*result)
 
-class OrderByNoHandler(BaseHandler):
-    def get(self, order_no: str):
-        db = SessionLocal()
-        try:
-            o = db.query(Order).filter(Order.order_no == order_no).one_or_none()
-            if not o:
-                self.set_status(404); self.finish({"detail": "订单不存在"}); return
-            self.write({
-                "id": o.id,
-                "order_no": o.order_no,
-                "group_code": o.group_code,
-                "weight_kg": o.weight_kg,
-                "shipping_fee": o.shipping_fee,
-                "wooden_crate": o.wooden_crate,
-                "status": o.status,
-                "updated_at": o.updated_at.isoformat() if o.updated_at else None,
-            })
-        finally:
-            db.close()
 
-    def put(self, order_no: str):
-        cu = get_current_user(self)
+class OrderByNoHandler(BaseHandler):
+    async def get(self, order_no: str):
+        # (encoded body, etag, last_modified); body is None for unknown numbers
+        entry = ORDER_CACHE.get(order_no)
+        if entry is None:
+            generation = ORDER_CACHE.generation()
+
+            def work(db):
+                return order_cache_entry(db.query(Order).filter(Order.order_no == order_no).one_or_none())
+
+            entry = await run_in_read_session(work)
+            cache_order_entry(order_no, entry, generation)
+        body, etag, last_modified = entry
+        if body is None:
+            self.set_status(404); self.finish({"detail": "订单不存在"}); return
+        if self.is_not_modified(etag, last_modified):
+            self.not_modified(etag, last_modified); return
+        self.set_validators(etag, last_modified)
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.write(body)
+
+    async def put(self, order_no: str):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] not in ("admin", "superadmin"):
@@ -480,11 +901,17 @@ class OrderByNoHandler(BaseHandler):
             payload = json.loads(self.request.body or b"{}")
         except Exception:
             self.set_status(400); self.finish({"detail": "Invalid JSON"}); return
-        db = SessionLocal()
-        try:
-            o = db.query(Order).filter(Order.order_no == order_no).one_or_none()
+
+        previous = {}
+
+        def work(db):
+            # Row lock keeps the summary delta in step with concurrent writers
+            o = db.query(Order).filter(Order.order_no == order_no).with_for_update().one_or_none()
             if not o:
-                self.set_status(404); self.finish({"detail": "订单不存在"}); return
+                return 404, {"detail": "订单不存在"}
+            previous.update(group_code=o.group_code, status=o.status)
+            delta = SummaryDelta()
+            delta.remove_order(o)
             if "group_code" in payload:
                 o.group_code = payload.get("group_code")
             if "weight_kg" in payload:
@@ -494,7 +921,7 @@ class OrderByNoHandler(BaseHandler):
             if "status" in payload:
                 status = payload.get("status")
                 if status not in STATUSES:
-                    self.set_status(400); self.finish({"detail": "状态非法"}); return
+                    return 400, {"detail": "状态非法"}
                 o.status = status
             if "wooden_crate" in payload:
                 val = payload.get("wooden_crate")
@@ -504,42 +931,106 @@ class OrderByNoHandler(BaseHandler):
                     o.wooden_crate = bool(val) if val is not None else None
             o.updated_at = datetime.utcnow()
             db.add(o)
+            delta.add_order(o)
+            delta.apply(db)
             db.commit()
             db.refresh(o)
-            self.write({
-                "id": o.id,
-                "order_no": o.order_no,
-                "group_code": o.group_code,
-                "weight_kg": o.weight_kg,
-                "shipping_fee": o.shipping_fee,
-                "status": o.status,
-                "updated_at": o.updated_at.isoformat() if o.updated_at else None,
-            })
-        finally:
-            db.close()
+            return 200, order_to_dict(o)
+
+        result = await run_in_session(work)
+        ORDER_CACHE.delete(order_no)
+        if result[0] == 200:
+            BROKER.publish([order_event("updated", result[1], previous)])
+        self.respond(*result)
 
-    def delete(self, order_no: str):
-        cu = get_current_user(self)
+    async def delete(self, order_no: str):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] not in ("admin", "superadmin"):
             self.set_status(403); self.finish({"detail": "无权限"}); return
-        db = SessionLocal()
-        try:
-            o = db.query(Order).filter(Order.order_no == order_no).one_or_none()
+
+        deleted = {}
+
+        def work(db):
+            # Row lock keeps the summary delta in step with concurrent writers
+            o = db.query(Order).filter(Order.order_no == order_no).with_for_update().one_or_none()
             if not o:
-                self.set_status(404); self.finish({"detail": "订单不存在"}); return
+                return 404, {"detail": "订单不存在"}
+            deleted.update(order_to_dict(o))
+            delta = SummaryDelta()
+            delta.remove_order(o)
             db.delete(o)
+            delta.apply(db)
             db.commit()
-            self.set_status(204)
-            self.finish()
-        finally:
-            db.close()
+            return 204, None
+
+        result = await run_in_session(work)
+        ORDER_CACHE.delete(order_no)
+        if deleted:
+            BROKER.publish([order_event("deleted", deleted)])
+        self.respond(*result)
+
+
+class OrdersLookupHandler(BaseHandler):
+    async def post(self):
+        """Resolve many order numbers at once: cached entries first, the rest in one IN query."""
+        try:
+            payload = json.loads(self.request.body or b"{}")
+        except Exception:
+            self.set_status(400); self.finish({"detail": "Invalid JSON"}); return
+        order_nos_raw = payload.get("order_nos") if isinstance(payload, dict) else None
+        if not isinstance(order_nos_raw, list) or not order_nos_raw:
+            self.set_status(400); self.finish({"detail": "缺少 order_nos 列表"}); return
+        order_nos = []
+        seen = set()
+        for code in order_nos_raw:
+            if not isinstance(code, (str, int)):
+                continue
+            s = str(code).strip()
+            if s and len(s) <= 64 and s not in seen:
+                seen.add(s)
+                order_nos.append(s)
+        if not order_nos:
+            self.set_status(400); self.finish({"detail": "缺少有效的订单号"}); return
+        if len(order_nos) > LOOKUP_MAX_ORDERS:
+            self.set_status(400); self.finish({"detail": f"一次最多查询 {LOOKUP_MAX_ORDERS} 个订单号"}); return
+
+        entries = {}
+        pending = []
+        for no in order_nos:
+            entry = ORDER_CACHE.get(no)
+            if entry is None:
+                pending.append(no)
+            else:
+                entries[no] = entry
+        if pending:
+            generation = ORDER_CACHE.generation()
+
+            def work(db):
+                rows = db.query(Order).filter(Order.order_no.in_(pending)).all()
+                by_no = {o.order_no: o for o in rows}
+                return {no: order_cache_entry(by_no.get(no)) for no in pending}
+
+            fetched = await run_in_read_session(work)
+            for no, entry in fetched.items():
+                cache_order_entry(no, entry, generation)
+            entries.update(fetched)
+
+        # Splice the cached per-order JSON instead of decoding and re-encoding it
+        found = [entries[no][0] for no in order_nos if entries[no][0] is not None]
+        missing = [no for no in order_nos if entries[no][0] is None]
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.write(
+            b'{"found":[' + b",".join(found) + b'],"missing":'
+            + tornado.escape.json_encode(missing).encode("utf-8")
+            + b',"count":' + str(len(found)).encode() + b"}"
+        )
 
 
 class OrdersBulkDeleteHandler(BaseHandler):
-    def delete(self):
-        cu = get_current_user(self)
+    async def delete(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] not in ("admin", "superadmin"):
@@ -560,18 +1051,90 @@ class OrdersBulkDeleteHandler(BaseHandler):
                 order_nos.append(s)
         if not order_nos:
             self.set_status(400); self.finish({"detail": "缺少有效的订单号"}); return
-        db = SessionLocal()
-        try:
+
+        events = []
+
+        def work(db):
+            cols = (Order.order_no, Order.group_code, Order.status, Order.weight_kg, Order.shipping_fee)
+            delta = SummaryDelta()
+            for row in db.query(*cols).filter(Order.order_no.in_(order_nos)).with_for_update():
+                delta.remove(row.group_code, row.status, row.weight_kg, row.shipping_fee)
+                events.append(order_event("deleted", {"order_no": row.order_no, "group_code": row.group_code, "status": row.status}))
             n = db.query(Order).filter(Order.order_no.in_(order_nos)).delete(synchronize_session=False)
+            delta.apply(db)
             db.commit()
-            self.write({"deleted": n})
+            return n
+
+        deleted = await run_in_session(work)
+        ORDER_CACHE.delete(*order_nos)
+        BROKER.publish(events)
+        self.write({"deleted": deleted})
+
+
+class OrderEventsHandler(BaseHandler):
+    """Server-Sent Events stream of order changes for ``code`` and/or ``order_no`` (repeatable or comma separated)."""
+
+    _sub = None
+
+    async def get(self):
+        def arg_values(name):
+            return [v.strip() for raw in self.get_query_arguments(name) for v in raw.split(",") if v.strip()]
+
+        topics = {code_topic(c) for c in arg_values("code")} | {("order", n) for n in arg_values("order_no")}
+        if not topics:
+            self.set_status(400); self.finish({"detail": "缺少 code 或 order_no"}); return
+        if len(topics) > SSE_MAX_TOPICS:
+            self.set_status(400); self.finish({"detail": f"一次最多订阅 {SSE_MAX_TOPICS} 个编号或订单号"}); return
+        if BROKER.stats()["subscribers"] >= SSE_MAX_CONNECTIONS:
+            self.set_status(503); self.finish({"detail": "订阅连接已满，请稍后重试"}); return
+
+        self.set_header("Content-Type", "text/event-stream; charset=UTF-8")
+        self.set_header("Cache-Control", "no-cache")
+        # Stop Nginx from buffering the stream
+        self.set_header("X-Accel-Buffering", "no")
+        self._streaming = True
+        self._sub = sub = BROKER.subscribe(topics)
+        try:
+            self.write("retry: 5000\n: subscribed\n\n")
+            await self.flush()
+            while True:
+                events = await sub.next_batch(SSE_KEEPALIVE_SECONDS)
+                if sub.closed:
+                    break
+                if sub.overflowed:
+                    sub.overflowed = False
+                    self.write("event: overflow\ndata: {}\n\n")
+                for event in events:
+                    self.write("event: order\ndata: " + json.dumps(event, ensure_ascii=False) + "\n\n")
+                if not events:
+                    self.write(": keepalive\n\n")
+                await self.flush()
+        except tornado.iostream.StreamClosedError:
+            pass
         finally:
-            db.close()
+            BROKER.unsubscribe(sub)
+            self._sub = None
+
+    def on_connection_close(self):
+        if self._sub is not None:
+            self._sub.close()
+
+
+class OrdersSummaryHandler(BaseHandler):
+    async def get(self):
+        """Counts, weight and fees per group and per status from order_summary (no orders scan)."""
+        cu = await get_current_user(self)
+        if not cu:
+            self.set_status(401); self.finish({"detail": "未授权"}); return
+        if cu["role"] not in ("admin", "superadmin"):
+            self.set_status(403); self.finish({"detail": "无权限"}); return
+        code = self.get_query_argument("code", default="").strip() or None
+        self.write(await run_in_read_session(read_summary, RATE_PER_KG, code))
 
 
 class OrdersExportHandler(BaseHandler):
-    def get(self):
-        cu = get_current_user(self)
+    async def get(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401)
             self.finish({"detail": "未授权"})
@@ -580,75 +1143,80 @@ class OrdersExportHandler(BaseHandler):
             self.set_status(403)
             self.finish({"detail": "无权限"})
             return
-        code = self.get_query_argument("code", default="").strip()
-        status_filter = self.get_query_argument("status", default="").strip()
-        start_raw = self.get_query_argument("start_date", default="").strip()
-        end_raw = self.get_query_argument("end_date", default="").strip()
-        if status_filter and status_filter not in STATUSES:
-            self.set_status(400)
-            self.finish({"detail": "状态非法"})
+        filters = self.parse_order_filters()
+        if filters is None:
             return
-        start_dt = parse_date_param(start_raw)
-        if start_raw and not start_dt:
+
+        fmt = self.get_query_argument("format", default="xlsx").strip().lower() or "xlsx"
+        if fmt not in EXPORT_FORMATS:
             self.set_status(400)
-            self.finish({"detail": "开始日期格式不正确"})
+            self.finish({"detail": "不支持的导出格式"})
             return
-        end_dt = parse_date_param(end_raw)
-        if end_raw and not end_dt:
-            self.set_status(400)
-            self.finish({"detail": "结束日期格式不正确"})
-            return
-        if start_dt and end_dt and start_dt > end_dt:
-            self.set_status(400)
-            self.finish({"detail": "开始日期不能晚于结束日期"})
+        stmt = apply_order_filters(select(*EXPORT_COLUMNS), filters).order_by(Order.updated_at.desc(), Order.id.desc())
+        content_type, ext = EXPORT_FORMATS[fmt]
+        filename = f"orders-export-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{ext}"
+        self.set_header("Content-Type", content_type)
+        self.set_header("Content-Disposition", f"attachment; filename={filename}")
+        started = time.perf_counter()
+        if fmt == "xlsx":
+            rows = await self._export_xlsx(stmt)
+        else:
+            rows = await self._export_stream(stmt, STREAM_ENCODERS[fmt], csv_header() if fmt == "csv" else b"")
+        if rows is None:
+            # Client went away mid-download; nothing left to send
             return
-        db = SessionLocal()
+        observe_export(fmt, time.perf_counter() - started, rows)
+        self.finish()
+
+    async def _export_xlsx(self, stmt):
+        # Rows stream from a server-side cursor into a write-only workbook on disk,
+        # then the finished file is flushed to the client in chunks.
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        count = 0
         try:
-            query = db.query(Order)
-            if code:
-                if code == 'A':
-                    query = query.filter((Order.group_code == None) | (Order.group_code == ""))
-                else:
-                    query = query.filter(Order.group_code == code)
-            if status_filter:
-                query = query.filter(Order.status == status_filter)
-            if start_dt:
-                query = query.filter(Order.updated_at >= start_dt)
-            if end_dt:
-                query = query.filter(Order.updated_at < (end_dt + timedelta(days=1)))
-            orders = query.order_by(Order.updated_at.desc()).all()
+            writer = XlsxExportWriter()
+            async with aclosing(stream_partitions(stmt, EXPORT_BATCH_SIZE, read_only=True)) as batches:
+                async for rows in batches:
+                    await run_blocking(writer.append_rows, rows)
+                    count += len(rows)
+            await run_blocking(writer.save, path)
+            self.set_header("Content-Length", os.path.getsize(path))
+            with open(path, "rb") as fh:
+                while True:
+                    chunk = await run_blocking(fh.read, EXPORT_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    self.write(chunk)
+                    await self.flush()
+        except tornado.iostream.StreamClosedError:
+            return None
         finally:
-            db.close()
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "orders"
-        headers = ["订单号", "编号", "重量(kg)", "运费", "状态", "木架", "更新时间"]
-        ws.append(headers)
-        for order in orders:
-            ws.append([
-                order.order_no,
-                order.group_code or '',
-                float(order.weight_kg) if order.weight_kg is not None else '',
-                float(order.shipping_fee) if order.shipping_fee is not None else '',
-                order.status,
-                ("是" if order.wooden_crate is True else ("否" if order.wooden_crate is False else "未设置")),
-                order.updated_at.isoformat() if order.updated_at else '',
-            ])
-
-        stream = BytesIO()
-        wb.save(stream)
-        stream.seek(0)
-        filename = f"orders-export-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.xlsx"
-        self.set_header("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        self.set_header("Content-Disposition", f"attachment; filename={filename}")
-        self.write(stream.getvalue())
-        self.finish()
+            os.remove(path)
+        return count
+
+    async def _export_stream(self, stmt, encode, header: bytes):
+        # Text formats are encoded batch by batch and flushed as they are read,
+        # so the first bytes reach the client before the query has finished.
+        # Returns None when the client disconnects; aclosing releases the cursor.
+        count = 0
+        try:
+            if header:
+                self.write(header)
+                await self.flush()
+            async with aclosing(stream_partitions(stmt, EXPORT_BATCH_SIZE, read_only=True)) as batches:
+                async for rows in batches:
+                    self.write(await run_blocking(encode, rows))
+                    await self.flush()
+                    count += len(rows)
+        except tornado.iostream.StreamClosedError:
+            return None
+        return count
 
 
 class AdminUsersHandler(BaseHandler):
-    def get(self):
-        cu = get_current_user(self)
+    async def get(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] != "superadmin":
@@ -661,8 +1229,8 @@ class AdminUsersHandler(BaseHandler):
             size = 1 if size < 1 else (200 if size > 200 else size)
         except Exception:
             page, size = 1, 20
-        db = SessionLocal()
-        try:
+
+        def work(db):
             q = db.query(AdminUser)
             if qstr:
                 q = q.filter(AdminUser.username.like(f"%{qstr}%"))
@@ -679,12 +1247,12 @@ class AdminUsersHandler(BaseHandler):
                     code_map.setdefault(c.user_id, []).append(c.code)
             def to_dict(u: AdminUser):
                 return {"id": u.id, "username": u.username, "role": u.role, "is_active": u.is_active, "created_at": u.created_at.isoformat() if u.created_at else None, "codes": code_map.get(u.id, [])}
-            self.write({"items": [to_dict(u) for u in rows], "total": total, "page": page, "page_size": size, "pages": (total + size - 1)//size})
-        finally:
-            db.close()
+            return {"items": [to_dict(u) for u in rows], "total": total, "page": page, "page_size": size, "pages": (total + size - 1)//size}
 
-    def post(self):
-        cu = get_current_user(self)
+        self.write(await run_in_session(work))
+
+    async def post(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] != "superadmin":
@@ -700,25 +1268,27 @@ class AdminUsersHandler(BaseHandler):
         codes = payload.get("codes") or []
         if not username or not password:
             self.set_status(400); self.finish({"detail": "缺少用户名或密码"}); return
-        db = SessionLocal()
-        try:
+        password_hash = await get_password_hash_async(password)
+
+        def work(db):
             exists = db.query(AdminUser).filter(AdminUser.username == username).one_or_none()
             if exists:
-                self.set_status(409); self.finish({"detail": "用户名已存在"}); return
-            from .auth import get_password_hash
-            u = AdminUser(username=username, password_hash=get_password_hash(password), role=role if role in ("user","admin","superadmin") else "user", is_active=is_active)
+                return 409, {"detail": "用户名已存在"}
+            u = AdminUser(username=username, password_hash=password_hash, role=role if role in ("user","admin","superadmin") else "user", is_active=is_active)
             db.add(u); db.flush()
             for c in codes:
                 s = str(c or '').strip()
                 if s:
                     db.add(UserCode(user_id=u.id, code=s))
             db.commit()
-            self.set_status(201); self.write({"id": u.id})
-        finally:
-            db.close()
+            return 201, {"id": u.id}
+
+        result = await run_in_session(work)
+        PRINCIPAL_CACHE.delete(username)
+        self.respond(*result)
 
-    def delete(self):
-        cu = get_current_user(self)
+    async def delete(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] != "superadmin":
@@ -738,19 +1308,22 @@ class AdminUsersHandler(BaseHandler):
                 continue
         if not ids:
             self.set_status(400); self.finish({"detail": "缺少有效的用户 id"}); return
-        db = SessionLocal()
-        try:
+
+        def work(db):
             db.query(UserCode).filter(UserCode.user_id.in_(ids)).delete(synchronize_session=False)
             n = db.query(AdminUser).filter(AdminUser.id.in_(ids)).delete(synchronize_session=False)
             db.commit()
-            self.write({"deleted": n})
-        finally:
-            db.close()
+            return n
+
+        n = await run_in_session(work)
+        # Usernames are gone with the rows; drop every cached principal
+        PRINCIPAL_CACHE.clear()
+        self.write({"deleted": n})
 
 
 class AdminUserDetailHandler(BaseHandler):
-    def put(self, uid: str):
-        cu = get_current_user(self)
+    async def put(self, uid: str):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] != "superadmin":
@@ -759,20 +1332,22 @@ class AdminUserDetailHandler(BaseHandler):
             payload = json.loads(self.request.body or b"{}")
         except Exception:
             self.set_status(400); self.finish({"detail": "Invalid JSON"}); return
-        db = SessionLocal()
-        try:
+        password_hash = None
+        if "password" in payload and payload.get("password"):
+            password_hash = await get_password_hash_async(payload["password"])
+
+        def work(db):
             u = db.query(AdminUser).filter(AdminUser.id == int(uid)).one_or_none()
             if not u:
-                self.set_status(404); self.finish({"detail": "用户不存在"}); return
+                return 404, {"detail": "用户不存在"}
             if "role" in payload:
                 r = (payload.get("role") or "").strip()
                 if r in ("user","admin","superadmin"):
                     u.role = r
             if "is_active" in payload:
                 u.is_active = parse_bool_param(payload.get("is_active"), default=u.is_active)
-            if "password" in payload and payload.get("password"):
-                from .auth import get_password_hash
-                u.password_hash = get_password_hash(payload["password"])
+            if password_hash:
+                u.password_hash = password_hash
             if "codes" in payload and isinstance(payload.get("codes"), list):
                 db.query(UserCode).filter(UserCode.user_id == u.id).delete(synchronize_session=False)
                 for c in payload.get("codes"):
@@ -780,25 +1355,25 @@ class AdminUserDetailHandler(BaseHandler):
                     if s:
                         db.add(UserCode(user_id=u.id, code=s))
             db.add(u); db.commit()
-            self.write({"ok": True})
-        finally:
-            db.close()
+            PRINCIPAL_CACHE.delete(u.username)
+            return 200, {"ok": True}
+
+        self.respond(*await run_in_session(work))
 
 
 class MeCodesHandler(BaseHandler):
-    def get(self):
-        cu = get_current_user(self)
+    async def get(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
-        db = SessionLocal()
-        try:
-            codes = [c.code for c in db.query(UserCode).filter(UserCode.user_id == cu["user_id"]).all()]
-            self.write({"codes": codes})
-        finally:
-            db.close()
 
-    def post(self):
-        cu = get_current_user(self)
+        def work(db):
+            return [c.code for c in db.query(UserCode).filter(UserCode.user_id == cu["user_id"]).all()]
+
+        self.write({"codes": await run_in_session(work)})
+
+    async def post(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         try:
@@ -808,25 +1383,26 @@ class MeCodesHandler(BaseHandler):
         code = (payload.get("code") or "").strip()
         if not code:
             self.set_status(400); self.finish({"detail": "缺少 code"}); return
-        db = SessionLocal()
-        try:
-            exists = db.query(UserCode).filter(UserCode.user_id == cu["user_id"], UserCode.code == code).one_or_none()
-            if exists:
-                self.set_status(409); self.finish({"detail": "编号已绑定"}); return
-            other_owner = db.query(UserCode).filter(UserCode.code == code, UserCode.user_id != cu["user_id"]).one_or_none()
-            if other_owner:
-                self.set_status(409); self.finish({"detail": "编号已被其他账号绑定"}); return
-            db.add(UserCode(user_id=cu["user_id"], code=code))
-            db.commit()
-            self.write({"ok": True})
-        except IntegrityError:
-            db.rollback()
-            self.set_status(409); self.finish({"detail": "编号已被其他账号绑定"}); return
-        finally:
-            db.close()
 
-    def delete(self):
-        cu = get_current_user(self)
+        def work(db):
+            try:
+                exists = db.query(UserCode).filter(UserCode.user_id == cu["user_id"], UserCode.code == code).one_or_none()
+                if exists:
+                    return 409, {"detail": "编号已绑定"}
+                other_owner = db.query(UserCode).filter(UserCode.code == code, UserCode.user_id != cu["user_id"]).one_or_none()
+                if other_owner:
+                    return 409, {"detail": "编号已被其他账号绑定"}
+                db.add(UserCode(user_id=cu["user_id"], code=code))
+                db.commit()
+                return 200, {"ok": True}
+            except IntegrityError:
+                db.rollback()
+                return 409, {"detail": "编号已被其他账号绑定"}
+
+        self.respond(*await run_in_session(work))
+
+    async def delete(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         try:
@@ -836,18 +1412,18 @@ class MeCodesHandler(BaseHandler):
         code = (payload.get("code") or "").strip()
         if not code:
             self.set_status(400); self.finish({"detail": "缺少 code"}); return
-        db = SessionLocal()
-        try:
+
+        def work(db):
             n = db.query(UserCode).filter(UserCode.user_id == cu["user_id"], UserCode.code == code).delete(synchronize_session=False)
             db.commit()
-            self.write({"deleted": n})
-        finally:
-            db.close()
+            return n
+
+        self.write({"deleted": await run_in_session(work)})
 
 
 class UserPasswordHandler(BaseHandler):
-    def post(self):
-        cu = get_current_user(self)
+    async def post(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         try:
@@ -860,95 +1436,144 @@ class UserPasswordHandler(BaseHandler):
             self.set_status(400); self.finish({"detail": "缺少密码"}); return
         if len(new_pwd) < 6:
             self.set_status(400); self.finish({"detail": "新密码至少 6 位"}); return
-        db = SessionLocal()
-        try:
+
+        def load(db):
+            u = db.query(AdminUser).filter(AdminUser.id == cu["user_id"]).one_or_none()
+            return u.password_hash if u else None
+
+        current_hash = await run_in_session(load)
+        if current_hash is None:
+            self.set_status(404); self.finish({"detail": "用户不存在"}); return
+        if not await verify_password_async(old_pwd, current_hash):
+            self.set_status(403); self.finish({"detail": "当前密码不正确"}); return
+        new_hash = await get_password_hash_async(new_pwd)
+
+        def work(db):
             u = db.query(AdminUser).filter(AdminUser.id == cu["user_id"]).one_or_none()
             if not u:
-                self.set_status(404); self.finish({"detail": "用户不存在"}); return
-            if not verify_password(old_pwd, u.password_hash):
-                self.set_status(403); self.finish({"detail": "当前密码不正确"}); return
-            u.password_hash = get_password_hash(new_pwd)
+                return 404, {"detail": "用户不存在"}
+            u.password_hash = new_hash
             db.add(u)
             db.commit()
-            self.write({"ok": True})
-        finally:
-            db.close()
+            PRINCIPAL_CACHE.delete(u.username)
+            return 200, {"ok": True}
 
+        self.respond(*await run_in_session(work))
 
+
+def _on_import_batch(rows: list) -> None:
+    """Runs on the import worker after each committed batch."""
+    ORDER_CACHE.delete(*(r["order_no"] for r in rows))
+    if BROKER.listening:
+        BROKER.publish([order_event("imported", r) for r in rows])
+
+
+@tornado.web.stream_request_body
 class ImportExcelHandler(BaseHandler):
-    def post(self):
-        cu = get_current_user(self)
+    """Multipart upload streamed straight to a temp file, then imported on the worker pool."""
+
+    async def prepare(self):
+        self._sink = None
+        self._tmp = None
+        super().prepare()
+        if self._finished or self.request.method != "POST":
+            return
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] not in ("admin", "superadmin"):
             self.set_status(403); self.finish({"detail": "无权限"}); return
-        if not self.request.files or "file" not in self.request.files:
-            self.set_status(400); self.finish({"detail": "请上传 .xlsx 文件"}); return
-        fileinfo = self.request.files["file"][0]
-        filename = fileinfo.filename or ""
-        if not filename.endswith(".xlsx"):
+        self._user = cu
+        # Reject oversized uploads from the declared length before reading any body
+        try:
+            declared = int(self.request.headers.get("Content-Length", "0"))
+        except ValueError:
+            declared = 0
+        if declared > IMPORT_MAX_BYTES:
+            self.set_status(413); self.finish({"detail": "文件过大"}); return
+        self.request.connection.set_max_body_size(IMPORT_MAX_BYTES)
+        boundary = multipart_boundary(self.request.headers.get("Content-Type", ""))
+        if not boundary:
             self.set_status(400); self.finish({"detail": "请上传 .xlsx 文件"}); return
-        # Save to temp and import
-        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=True) as tmp:
-            tmp.write(fileinfo.body)
-            tmp.flush()
-            db = SessionLocal()
-            try:
-                stats = import_excel(db, tmp.name)
-            finally:
-                db.close()
-        self.write(stats)
+        self._tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+        self._sink = MultipartFileSink(boundary, "file", self._tmp)
 
+    def data_received(self, chunk: bytes):
+        # Chunks are at most one read buffer; a buffered write to the temp file
+        # is cheaper than a trip through the DB executor and its queue limit
+        if self._sink is not None:
+            self._sink.feed(chunk)
 
-class AnnouncementHandler(BaseHandler):
-    def get(self):
-        db = SessionLocal()
+    async def post(self):
         try:
-            s_html = db.query(Setting).filter(Setting.key == 'bulletin_html').one_or_none()
-            s_title = db.query(Setting).filter(Setting.key == 'bulletin_title').one_or_none()
-            s_contacts = db.query(Setting).filter(Setting.key == 'admin_contacts').one_or_none()
-            s_invites = db.query(Setting).filter(Setting.key == 'register_invite_codes').one_or_none()
-            updated = None
-            for s in (s_html, s_title):
-                if s and s.updated_at:
-                    if not updated or s.updated_at > updated:
-                        updated = s.updated_at
-            contacts = []
-            if s_contacts and s_contacts.value:
-                try:
-                    data = json.loads(s_contacts.value)
-                    if isinstance(data, list):
-                        for item in data:
-                            if not isinstance(item, dict):
-                                continue
-                            contacts.append({
-                                'icon': str(item.get('icon') or ''),
-                                'label': str(item.get('label') or ''),
-                                'value': str(item.get('value') or ''),
-                                'href': str(item.get('href') or ''),
-                            })
-                except Exception:
-                    contacts = []
-            invite_codes = []
-            if s_invites and s_invites.value:
+            try:
+                self._sink.close()
+            except UploadError:
+                self.set_status(400); self.finish({"detail": "上传内容不完整"}); return
+            self._tmp.close()
+            filename = self._sink.filename or ""
+            if not self._sink.found or not filename.endswith(".xlsx"):
+                self.set_status(400); self.finish({"detail": "请上传 .xlsx 文件"}); return
+            # The job owns the temp file from here on and deletes it when done
+            path = self._tmp.name
+            self._tmp = None
+            job, future = submit_import_job(path, filename, self._user["username"], on_batch=_on_import_batch)
+            if parse_bool_param(self.get_query_argument("wait", default=None)):
+                # Synchronous mode for scripts: wait without blocking the IOLoop
                 try:
-                    data = json.loads(s_invites.value)
-                    if isinstance(data, list):
-                        invite_codes = [str(item).strip() for item in data if str(item).strip()]
+                    stats = await asyncio.wrap_future(future)
                 except Exception:
-                    invite_codes = []
-            self.write({
-                "html": s_html.value if s_html else "",
-                "title": s_title.value if s_title and s_title.value else "公告栏",
-                "updated_at": updated.isoformat() if updated else None,
-                "contacts": contacts,
-                "invite_codes": invite_codes,
-            })
+                    self.set_status(500); self.finish({"detail": "导入失败", "job": job.to_dict()}); return
+                self.write({**stats, "job_id": job.id})
+                return
+            self.set_status(202)
+            self.write({"job_id": job.id, "status_url": f"/orderapi/import/jobs/{job.id}", "job": job.to_dict()})
         finally:
-            db.close()
+            self._cleanup_upload()
+
+    def on_finish(self):
+        self._cleanup_upload()
+        super().on_finish()
+
+    def on_connection_close(self):
+        self._cleanup_upload()
 
-    def put(self):
-        cu = get_current_user(self)
+    def _cleanup_upload(self):
+        tmp = getattr(self, "_tmp", None)
+        if tmp is None:
+            return
+        self._tmp = None
+        self._sink = None
+        try:
+            tmp.close()
+            os.remove(tmp.name)
+        except OSError:
+            pass
+
+
+class ImportJobHandler(BaseHandler):
+    async def get(self, job_id: str):
+        cu = await get_current_user(self)
+        if not cu:
+            self.set_status(401); self.finish({"detail": "未授权"}); return
+        if cu["role"] not in ("admin", "superadmin"):
+            self.set_status(403); self.finish({"detail": "无权限"}); return
+        job = await run_blocking(get_import_job_status, job_id)
+        if not job:
+            self.set_status(404); self.finish({"detail": "导入任务不存在"}); return
+        self.write(job)
+
+
+class AnnouncementHandler(BaseHandler):
+    async def get(self):
+        entry = await get_site_settings()
+        if self.is_not_modified(entry["etag"], entry["last_modified"]):
+            self.not_modified(entry["etag"], entry["last_modified"]); return
+        self.set_validators(entry["etag"], entry["last_modified"])
+        self.write(entry["data"])
+
+    async def put(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] not in ("admin", "superadmin"):
@@ -963,8 +1588,8 @@ class AnnouncementHandler(BaseHandler):
         if html is None and title is None:
             if contacts_payload is None:
                 self.set_status(400); self.finish({"detail": "缺少更新内容"}); return
-        db = SessionLocal()
-        try:
+
+        def work(db):
             now = datetime.utcnow()
             if html is not None:
                 s = db.query(Setting).filter(Setting.key == 'bulletin_html').one_or_none()
@@ -1038,14 +1663,17 @@ class AnnouncementHandler(BaseHandler):
                 db.commit()
             except Exception:
                 db.rollback()
-            self.write({"ok": True})
+
+        try:
+            await run_in_session(work)
         finally:
-            db.close()
+            SETTINGS_CACHE.clear()
+        self.write({"ok": True})
 
 
 class AnnouncementHistoryHandler(BaseHandler):
-    def get(self):
-        cu = get_current_user(self)
+    async def get(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] not in ("admin", "superadmin"):
@@ -1056,8 +1684,8 @@ class AnnouncementHistoryHandler(BaseHandler):
         except Exception:
             limit = 20
         limit = max(1, min(100, limit))
-        db = SessionLocal()
-        try:
+
+        def work(db):
             rows = db.query(AnnouncementHistory).order_by(AnnouncementHistory.id.desc()).limit(limit).all()
             def to_dict(r: AnnouncementHistory):
                 return {
@@ -1066,14 +1694,14 @@ class AnnouncementHistoryHandler(BaseHandler):
                     "html": r.html,
                     "created_at": r.created_at.isoformat() if r.created_at else None,
                 }
-            self.write({"items": [to_dict(r) for r in rows]})
-        finally:
-            db.close()
+            return [to_dict(r) for r in rows]
+
+        self.write({"items": await run_in_session(work)})
 
 
 class AnnouncementRevertHandler(BaseHandler):
-    def post(self):
-        cu = get_current_user(self)
+    async def post(self):
+        cu = await get_current_user(self)
         if not cu:
             self.set_status(401); self.finish({"detail": "未授权"}); return
         if cu["role"] not in ("admin", "superadmin"):
@@ -1085,11 +1713,11 @@ class AnnouncementRevertHandler(BaseHandler):
         hid = payload.get("id")
         if not hid:
             self.set_status(400); self.finish({"detail": "缺少字段 id"}); return
-        db = SessionLocal()
-        try:
+
+        def work(db):
             r = db.query(AnnouncementHistory).filter(AnnouncementHistory.id == hid).one_or_none()
             if not r:
-                self.set_status(404); self.finish({"detail": "历史版本不存在"}); return
+                return 404, {"detail": "历史版本不存在"}
             now = datetime.utcnow()
             s_html = db.query(Setting).filter(Setting.key == 'bulletin_html').one_or_none()
             if not s_html:
@@ -1110,9 +1738,13 @@ class AnnouncementRevertHandler(BaseHandler):
             hist = AnnouncementHistory(title=s_title.value, html=s_html.value, updated_by=str(cu.get("username")))
             db.add(hist)
             db.commit()
-            self.write({"ok": True})
+            return 200, {"ok": True}
+
+        try:
+            result = await run_in_session(work)
         finally:
-            db.close()
+            SETTINGS_CACHE.clear()
+        self.respond(*result)
 
 
 def make_app():
@@ -1227,7 +1859,7 @@ def make_app():
           uploading.value = true; msg.value = '上传中...';
           try {
             const fd = new FormData(); fd.append('file', f);
-            await api('/import/excel', { method:'POST', body: fd });
+            await api('/import/excel?wait=1', { method:'POST', body: fd });
             msg.value = '导入成功';
           } catch(e) { msg.value = e.message; }
           finally { uploading.value = false; ev.target.value=''; }
@@ -1371,6 +2003,7 @@ def make_app():
 
     return tornado.web.Application([
         (r"/orderapi/health", HealthHandler),
+        (r"/orderapi/metrics", MetricsHandler),
         (r"/orderapi/register/check-username", UsernameCheckHandler),
         (r"/orderapi/register/random-username", RandomUsernameHandler),
         (r"/orderapi/register", RegisterHandler),
@@ -1378,8 +2011,12 @@ def make_app():
         (r"/orderapi/orders", OrdersHandler),
         (r"/orderapi/orders/by-no/([A-Za-z0-9\-_]+)", OrderByNoHandler),
         (r"/orderapi/orders/bulk", OrdersBulkDeleteHandler),
+        (r"/orderapi/orders/lookup", OrdersLookupHandler),
+        (r"/orderapi/orders/summary", OrdersSummaryHandler),
+        (r"/orderapi/orders/events", OrderEventsHandler),
         (r"/orderapi/orders/export", OrdersExportHandler),
         (r"/orderapi/import/excel", ImportExcelHandler),
+        (r"/orderapi/import/jobs/([0-9a-f]+)", ImportJobHandler),
         (r"/orderapi/announcement", AnnouncementHandler),
         (r"/orderapi/announcement/history", AnnouncementHistoryHandler),
         (r"/orderapi/announcement/revert", AnnouncementRevertHandler),
@@ -1394,8 +2031,34 @@ def make_app():
 def main():
     app = make_app()
     port = int(os.getenv("PORT", "8000"))
-    app.listen(port, address=os.getenv("HOST", "0.0.0.0"))
-    print(f"Tornado server listening on {os.getenv('HOST', '0.0.0.0')}:{port}")
+    host = os.getenv("HOST", "0.0.0.0")
+    # Worker processes sharing one listening socket; 0 = one per CPU core
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers != 1 and app.settings.get("autoreload"):
+        print("[server] DEBUG autoreload is incompatible with WORKERS; running a single process")
+        workers = 1
+    if workers == 1:
+        app.listen(port, address=host)
+        print(f"Tornado server listening on {host}:{port}")
+        tornado.ioloop.IOLoop.current().start()
+        return
+
+    # Schema setup and admin bootstrap already ran in make_app(), once, in the
+    # parent. Bind before forking so every child accepts on the same socket;
+    # thread/process pools are created lazily and therefore only in children.
+    sockets = tornado.netutil.bind_sockets(port, address=host)
+    prepare_shared_dir()
+    prepare_pubsub_dir()
+    prepare_job_dir()
+    task_id = tornado.process.fork_processes(workers)
+    dispose_engine_after_fork()
+    # Relay order events between workers so every stream sees every write
+    BROKER.start_relay()
+    # Publish this worker's metrics for whichever sibling answers the scrape
+    tornado.ioloop.PeriodicCallback(write_snapshot, METRICS_FLUSH_SECONDS * 1000).start()
+    server = tornado.httpserver.HTTPServer(app)
+    server.add_sockets(sockets)
+    print(f"Tornado worker {task_id} (pid {os.getpid()}) listening on {host}:{port}")
     tornado.ioloop.IOLoop.current().start()
 
 
@@ -0,0 +1,206 @@
+import sys
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import Order, OrderSummary
+
+
+############################################################
+# Per-(group_code, status) order totals
+############################################################
+# order_summary holds count / weight / explicit fee / weight without a fee for
+# every (group_code, status) pair, so dashboards read O(groups) rows instead of
+# scanning orders. Write paths record the before/after values of the orders
+# they touch in a SummaryDelta and apply it in the same transaction as the
+# write; `python -m backend.summary rebuild` recomputes the table from orders.
+# Computed fees (RATE_PER_KG * weight) are derived from unpriced_weight at
+# read time, so changing the rate needs no rebuild.
+
+UNASSIGNED = ""  # group_code NULL and "" are both stored under ""
+
+
+def _group_key(group_code) -> str:
+    # Spreadsheet cells may hold numeric codes; the column stores them as text
+    return str(group_code) if group_code else UNASSIGNED
+
+
+class SummaryDelta:
+    """Accumulates per-key changes from order writes; ``apply`` flushes them with one upsert per key."""
+
+    def __init__(self):
+        # (group_code, status) -> [count, weight, fee, unpriced_weight]
+        self._changes: dict[tuple, list] = {}
+
+    def add(self, group_code: Optional[str], status: Optional[str], weight_kg: Optional[float],
+            shipping_fee: Optional[float], sign: int = 1) -> None:
+        key = (_group_key(group_code), str(status or ""))
+        change = self._changes.setdefault(key, [0, 0.0, 0.0, 0.0])
+        weight = float(weight_kg or 0.0)
+        change[0] += sign
+        change[1] += sign * weight
+        if shipping_fee is not None:
+            change[2] += sign * float(shipping_fee)
+        else:
+            change[3] += sign * weight
+
+    def remove(self, group_code, status, weight_kg, shipping_fee) -> None:
+        self.add(group_code, status, weight_kg, shipping_fee, sign=-1)
+
+    def add_order(self, o) -> None:
+        self.add(o.group_code, o.status, o.weight_kg, o.shipping_fee)
+
+    def remove_order(self, o) -> None:
+        self.remove(o.group_code, o.status, o.weight_kg, o.shipping_fee)
+
+    def apply(self, db) -> None:
+        """Upsert the accumulated changes; call before the write's commit."""
+        rows = [
+            {"group_code": g, "status": s, "order_count": c[0], "total_weight": c[1],
+             "total_fee": c[2], "unpriced_weight": c[3]}
+            # Sorted so concurrent writers lock summary rows in the same order
+            for (g, s), c in sorted(self._changes.items()) if any(c)
+        ]
+        self._changes.clear()
+        if not rows:
+            return
+        now = datetime.utcnow()
+        for r in rows:
+            r["updated_at"] = now
+        table = OrderSummary.__table__
+        dialect = db.get_bind().dialect.name
+        if dialect.startswith("mysql"):
+            stmt = mysql_insert(table).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                order_count=table.c.order_count + stmt.inserted.order_count,
+                total_weight=table.c.total_weight + stmt.inserted.total_weight,
+                total_fee=table.c.total_fee + stmt.inserted.total_fee,
+                unpriced_weight=table.c.unpriced_weight + stmt.inserted.unpriced_weight,
+                updated_at=stmt.inserted.updated_at,
+            )
+            db.execute(stmt)
+        elif dialect == "sqlite":
+            stmt = sqlite_insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.group_code, table.c.status],
+                set_={
+                    "order_count": table.c.order_count + stmt.excluded.order_count,
+                    "total_weight": table.c.total_weight + stmt.excluded.total_weight,
+                    "total_fee": table.c.total_fee + stmt.excluded.total_fee,
+                    "unpriced_weight": table.c.unpriced_weight + stmt.excluded.unpriced_weight,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            db.execute(stmt)
+        else:
+            for r in rows:
+                res = db.execute(
+                    update(table)
+                    .where(table.c.group_code == r["group_code"], table.c.status == r["status"])
+                    .values(
+                        order_count=table.c.order_count + r["order_count"],
+                        total_weight=table.c.total_weight + r["total_weight"],
+                        total_fee=table.c.total_fee + r["total_fee"],
+                        unpriced_weight=table.c.unpriced_weight + r["unpriced_weight"],
+                        updated_at=now,
+                    )
+                )
+                if not res.rowcount:
+                    db.execute(insert(table).values(**r))
+        if any(r["order_count"] < 0 for r in rows):
+            db.execute(delete(table).where(table.c.order_count <= 0))
+
+
+def _aggregate_select():
+    return select(
+        func.coalesce(Order.group_code, UNASSIGNED),
+        Order.status,
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.weight_kg), 0.0),
+        func.coalesce(func.sum(Order.shipping_fee), 0.0),
+        func.coalesce(func.sum(case((Order.shipping_fee.is_(None), Order.weight_kg), else_=0.0)), 0.0),
+    ).group_by(func.coalesce(Order.group_code, UNASSIGNED), Order.status)
+
+
+def rebuild(db) -> int:
+    """Recompute the whole table from orders (one GROUP BY); returns summary rows written.
+
+    Works on a Session or a Connection; the caller commits.
+    """
+    now = datetime.utcnow()
+    totals: dict[tuple, list] = {}
+    for g, s, count, weight, fee, unpriced in db.execute(_aggregate_select()):
+        # NULL and "" group codes fold into one key
+        t = totals.setdefault((g or UNASSIGNED, s or ""), [0, 0.0, 0.0, 0.0])
+        t[0] += count
+        t[1] += float(weight or 0.0)
+        t[2] += float(fee or 0.0)
+        t[3] += float(unpriced or 0.0)
+    db.execute(delete(OrderSummary.__table__))
+    rows = [
+        {"group_code": g, "status": s, "order_count": t[0], "total_weight": t[1], "total_fee": t[2],
+         "unpriced_weight": t[3], "updated_at": now}
+        for (g, s), t in totals.items()
+    ]
+    if rows:
+        db.execute(insert(OrderSummary.__table__), rows)
+    return len(rows)
+
+
+def read_summary(db, rate_per_kg: float, code: Optional[str] = None) -> dict:
+    """Per-group and per-status totals from order_summary (``code`` "A" = unassigned)."""
+    q = select(OrderSummary)
+    if code:
+        q = q.where(OrderSummary.group_code == (UNASSIGNED if code == "A" else code))
+    groups: dict[str, dict] = {}
+    statuses: dict[str, dict] = {}
+    overall = {"count": 0, "total_weight": 0.0, "total_shipping_fee": 0.0}
+    last_updated = None
+    for r in db.execute(q).scalars():
+        fee = r.total_fee + r.unpriced_weight * rate_per_kg
+        code_out = r.group_code or "A"
+        g = groups.setdefault(code_out, {"code": code_out, "count": 0, "total_weight": 0.0, "total_shipping_fee": 0.0, "statuses": {}})
+        st = statuses.setdefault(r.status, {"status": r.status, "count": 0, "total_weight": 0.0, "total_shipping_fee": 0.0})
+        for bucket in (g, st, overall):
+            bucket["count"] += r.order_count
+            bucket["total_weight"] += r.total_weight
+            bucket["total_shipping_fee"] += fee
+        g["statuses"][r.status] = r.order_count
+        if r.updated_at and (last_updated is None or r.updated_at > last_updated):
+            last_updated = r.updated_at
+
+    def rounded(d: dict) -> dict:
+        d["total_weight"] = round(d["total_weight"], 3)
+        d["total_shipping_fee"] = round(d["total_shipping_fee"], 2)
+        return d
+
+    return {
+        "groups": [rounded(g) for g in sorted(groups.values(), key=lambda g: -g["count"])],
+        "statuses": [rounded(s) for s in sorted(statuses.values(), key=lambda s: -s["count"])],
+        "totals": rounded(overall),
+        "updated_at": last_updated.isoformat() if last_updated else None,
+    }
+
+
+def main():
+    """python -m backend.summary rebuild: recompute order_summary from orders."""
+    from .db import SessionLocal, db_connection_summary, init_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        raise SystemExit("usage: python -m backend.summary rebuild")
+    init_db()
+    print(f"Database: {db_connection_summary()}")
+    db = SessionLocal()
+    try:
+        n = rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt order_summary: {n} (group, status) rows")
+
+
+if __name__ == "__main__":
+    main()
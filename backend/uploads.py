@@ -0,0 +1,120 @@
+from email.message import Message
+from typing import BinaryIO, Optional
+
+
+# Part headers larger than this are rejected (protects the in-memory buffer)
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+
+class UploadError(Exception):
+    """Malformed multipart body."""
+
+
+def multipart_boundary(content_type: str) -> Optional[bytes]:
+    """Extract the boundary from a multipart/form-data Content-Type header."""
+    if not content_type or not content_type.lower().startswith("multipart/form-data"):
+        return None
+    for field in content_type.split(";")[1:]:
+        k, sep, v = field.strip().partition("=")
+        if sep and k.strip().lower() == "boundary" and v:
+            v = v.strip()
+            if v.startswith('"') and v.endswith('"'):
+                v = v[1:-1]
+            return v.encode("latin1")
+    return None
+
+
+class MultipartFileSink:
+    """Incremental multipart/form-data parser that writes one file field to disk.
+
+    Chunks are fed as they arrive (``RequestHandler.data_received``); only the
+    bytes of the ``field`` part are written to ``dest``, everything else is
+    discarded. At most one boundary length of data is held in memory.
+    """
+
+    def __init__(self, boundary: bytes, field: str, dest: BinaryIO):
+        self.field = field
+        self.dest = dest
+        self.filename: Optional[str] = None
+        self.size = 0
+        self.found = False
+        self._delimiter = b"--" + boundary
+        self._buf = b""
+        self._state = "preamble"
+        self._writing = False
+
+    def feed(self, chunk: bytes) -> None:
+        self._buf += chunk
+        while self._step():
+            pass
+
+    def close(self) -> None:
+        if self._state != "done":
+            raise UploadError("multipart body ended before the closing boundary")
+        self.dest.flush()
+
+    def _step(self) -> bool:
+        if self._state == "preamble":
+            idx = self._buf.find(self._delimiter)
+            if idx < 0:
+                self._buf = self._buf[-len(self._delimiter):]
+                return False
+            self._buf = self._buf[idx + len(self._delimiter):]
+            self._state = "boundary"
+            return True
+        if self._state == "boundary":
+            # After a delimiter: "--" closes the body, CRLF starts the next part
+            if len(self._buf) < 2:
+                return False
+            if self._buf.startswith(b"--"):
+                self._state = "done"
+                self._buf = b""
+                return False
+            if not self._buf.startswith(b"\r\n"):
+                raise UploadError("malformed multipart boundary")
+            self._buf = self._buf[2:]
+            self._state = "headers"
+            return True
+        if self._state == "headers":
+            idx = self._buf.find(b"\r\n\r\n")
+            if idx < 0:
+                if len(self._buf) > MAX_PART_HEADER_BYTES:
+                    raise UploadError("multipart part headers too large")
+                return False
+            raw = self._buf[:idx].decode("utf-8", errors="replace")
+            self._buf = self._buf[idx + 4:]
+            msg = Message()
+            for line in raw.split("\r\n"):
+                name, sep, value = line.partition(":")
+                if sep:
+                    msg[name.strip()] = value.strip()
+            name = msg.get_param("name", header="content-disposition")
+            self._writing = (not self.found) and name == self.field and msg.get_filename() is not None
+            if self._writing:
+                self.found = True
+                self.filename = msg.get_filename()
+            self._state = "body"
+            return True
+        if self._state == "body":
+            marker = b"\r\n" + self._delimiter
+            idx = self._buf.find(marker)
+            if idx < 0:
+                # Keep a tail that could be the start of a split delimiter
+                keep = len(marker) - 1
+                if len(self._buf) > keep:
+                    self._emit(self._buf[:-keep])
+                    self._buf = self._buf[-keep:]
+                return False
+            self._emit(self._buf[:idx])
+            self._buf = self._buf[idx + len(marker):]
+            self._writing = False
+            self._state = "boundary"
+            return True
+        # done: ignore the epilogue
+        self._buf = b""
+        return False
+
+    def _emit(self, data: bytes) -> None:
+        if self._writing and data:
+            self.dest.write(data)
+            self.size += len(data)
@@ -23,7 +23,9 @@ CREATE TABLE IF NOT EXISTS `orders` (
   PRIMARY KEY (`id`),
   UNIQUE KEY `uq_order_no` (`order_no`),
   KEY `idx_group_code` (`group_code`),
-  KEY `idx_updated_at` (`updated_at`)
+  KEY `idx_updated_at` (`updated_at`),
+  KEY `ix_orders_group_code_updated_at` (`group_code`, `updated_at`),
+  KEY `ix_orders_status_updated_at` (`status`, `updated_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- 2) Settings (KV: bulletin_title/bulletin_html etc.)
@@ -72,3 +74,28 @@ CREATE TABLE IF NOT EXISTS `user_codes` (
     FOREIGN KEY (`user_id`) REFERENCES `admin_users`(`id`)
     ON DELETE CASCADE ON UPDATE RESTRICT
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 6) Order totals per (group_code, status), maintained by the backend on
+--    every order write (backend/summary.py); group_code '' = unassigned.
+--    Repair with `python -m backend.summary rebuild`.
+CREATE TABLE IF NOT EXISTS `order_summary` (
+  `group_code` VARCHAR(64) NOT NULL,
+  `status` VARCHAR(64) NOT NULL,
+  `order_count` INT NOT NULL DEFAULT 0,
+  `total_weight` DOUBLE NOT NULL DEFAULT 0,
+  `total_fee` DOUBLE NOT NULL DEFAULT 0,
+  `unpriced_weight` DOUBLE NOT NULL DEFAULT 0,
+  `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`group_code`, `status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 7) Applied schema migrations (backend/migrations.py). Left empty on purpose:
+--    CREATE TABLE IF NOT EXISTS does not upgrade existing tables, so the
+--    backend checks each step against the live schema on startup (or with
+--    `python -m backend.migrations`) and records it here.
+CREATE TABLE IF NOT EXISTS `schema_version` (
+  `version` INT NOT NULL,
+  `name` VARCHAR(128) NOT NULL,
+  `applied_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# backend.db builds its engine at import time, so point it at a throwaway
+# SQLite file before any test module imports the backend
+_DB_DIR = tempfile.mkdtemp(prefix="automatica-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault("LOG_DB_CREDS", "false")
+os.environ["STRICT_ORIGIN"] = "false"
+os.environ["ADMIN_USERNAME"] = "admin"
+os.environ["ADMIN_PASSWORD"] = "admin123"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def db():
+    from backend.db import SessionLocal, init_db
+    from backend.models import Order, OrderSummary
+
+    init_db()
+    session = SessionLocal()
+    session.query(Order).delete()
+    session.query(OrderSummary).delete()
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,69 @@
+import io
+import json
+
+from tornado.testing import AsyncHTTPTestCase
+
+from backend import server
+from backend.db import SessionLocal
+from backend.models import Order, OrderSummary
+
+
+def clear_orders() -> None:
+    db = SessionLocal()
+    try:
+        db.query(Order).delete()
+        db.query(OrderSummary).delete()
+        db.commit()
+    finally:
+        db.close()
+    server.ORDER_CACHE.clear()
+
+
+class ApiTestCase(AsyncHTTPTestCase):
+    """The full application on a test port; ``api`` sends JSON and decodes JSON replies."""
+
+    def setUp(self):
+        super().setUp()
+        clear_orders()
+
+    def get_app(self):
+        return server.make_app()
+
+    def token(self) -> str:
+        r = self.fetch("/orderapi/login", method="POST", body=json.dumps({"username": "admin", "password": "admin123"}))
+        assert r.code == 200, r.body
+        return json.loads(r.body)["access_token"]
+
+    def api(self, method, path, body=None, token=None, headers=None):
+        h = dict(headers or {})
+        if token:
+            h["Authorization"] = f"Bearer {token}"
+        if body is not None and not isinstance(body, (bytes, str)):
+            body = json.dumps(body)
+        return self.fetch(path, method=method, body=body, headers=h, allow_nonstandard_methods=True)
+
+
+def multipart(fields: dict, files: dict, boundary: str = "testboundary7MA4YWxk") -> tuple:
+    """Encode a multipart/form-data body; ``files`` maps field -> (filename, bytes)."""
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        head = f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+        head += "Content-Type: application/octet-stream\r\n\r\n"
+        parts.append(head.encode("utf-8") + data + b"\r\n")
+    return b"".join(parts) + f"--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def xlsx_bytes(rows: list) -> bytes:
+    """An import spreadsheet with the expected header row followed by ``rows``."""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["order_no", "group_code", "weight_kg", "status", "shipping_fee"])
+    for row in rows:
+        ws.append(row)
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
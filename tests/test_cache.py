@@ -0,0 +1,80 @@
+from backend.cache import TTLCache
+
+
+def test_set_with_generation_is_dropped_after_invalidation():
+    cache = TTLCache(maxsize=10, ttl=60)
+    generation = cache.generation()
+    # A write invalidates the key while the reader is still querying
+    cache.delete("A1")
+    assert cache.set("A1", "stale", generation=generation) is False
+    assert cache.get("A1") is None
+    assert cache.stats()["stale_sets"] == 1
+
+    generation = cache.generation()
+    assert cache.set("A1", "fresh", generation=generation) is True
+    assert cache.get("A1") == "fresh"
+
+
+def test_miss_entries_expire_with_their_own_ttl():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("A2", (None, None, None), ttl=0)
+    assert cache.get("A2") is None
+
+
+def _add_user(db, username, role):
+    from backend.models import AdminUser
+
+    db.query(AdminUser).filter(AdminUser.username == username).delete()
+    db.add(AdminUser(username=username, password_hash="x", role=role))
+    db.commit()
+
+
+def test_principal_lookup_racing_a_role_change_is_not_cached(db, monkeypatch):
+    import asyncio
+
+    from backend import server
+    from backend.models import AdminUser
+
+    _add_user(db, "race-admin", "admin")
+    server.PRINCIPAL_CACHE.clear()
+    monkeypatch.setattr(server, "require_bearer", lambda handler: "race-admin")
+    real_run_in_session = server.run_in_session
+
+    async def lookup_then_demote(fn, *args):
+        user = await real_run_in_session(fn, *args)
+        # AdminUserDetailHandler.put commits and invalidates while the lookup is in flight
+        db.query(AdminUser).filter(AdminUser.username == "race-admin").update({"role": "user"})
+        db.commit()
+        server.PRINCIPAL_CACHE.delete("race-admin")
+        return user
+
+    monkeypatch.setattr(server, "run_in_session", lookup_then_demote)
+    assert asyncio.run(server.get_current_user(None))["role"] == "admin"
+    assert server.PRINCIPAL_CACHE.get("race-admin") is None
+
+    monkeypatch.setattr(server, "run_in_session", real_run_in_session)
+    assert asyncio.run(server.get_current_user(None))["role"] == "user"
+    assert server.PRINCIPAL_CACHE.get("race-admin")["role"] == "user"
+
+
+def test_settings_read_racing_a_settings_update_is_not_cached(monkeypatch):
+    import asyncio
+
+    from backend import server
+
+    server.SETTINGS_CACHE.clear()
+    real_run_in_read_session = server.run_in_read_session
+
+    async def read_then_update(fn, *args):
+        data = await real_run_in_read_session(fn, *args)
+        # The settings PUT handler clears the cache once its commit is done
+        server.SETTINGS_CACHE.clear()
+        return data
+
+    monkeypatch.setattr(server, "run_in_read_session", read_then_update)
+    asyncio.run(server.get_site_settings())
+    assert server.SETTINGS_CACHE.get("site") is None
+
+    monkeypatch.setattr(server, "run_in_read_session", real_run_in_read_session)
+    data = asyncio.run(server.get_site_settings())
+    assert server.SETTINGS_CACHE.get("site") is data
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from backend import jobs
+from backend.models import STATUSES
+from support import ApiTestCase, multipart, xlsx_bytes
+
+
+def test_job_status_is_scoped_to_this_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "IMPORT_JOB_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs, "_run_dir", None)
+    job_id = "ab" * 16
+    # Another live deployment sharing the base directory
+    other_run = tmp_path / str(os.getppid())
+    other_run.mkdir()
+    (other_run / f"{job_id}.json").write_text(json.dumps({"id": job_id, "status": "done"}))
+    assert jobs.get_import_job_status(job_id) is None
+
+    jobs.prepare_job_dir()
+    assert jobs.get_import_job_status(job_id) is None
+    os.utime(other_run / f"{job_id}.json", (0, 0))
+    jobs._prune_jobs()
+    assert (other_run / f"{job_id}.json").exists()
+
+
+def _statuses_seen(monkeypatch) -> list:
+    seen = []
+    save = jobs.ImportJob.save_snapshot
+
+    def recording(job):
+        if not seen or seen[-1] != job.status:
+            seen.append(job.status)
+        save(job)
+
+    monkeypatch.setattr(jobs.ImportJob, "save_snapshot", recording)
+    return seen
+
+
+def test_job_runs_queued_running_done(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "IMPORT_JOB_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs, "_run_dir", None)
+    jobs.prepare_job_dir()
+    seen = _statuses_seen(monkeypatch)
+    path = tmp_path / "orders.xlsx"
+    path.write_bytes(xlsx_bytes([["J1", "G1", 1.5, STATUSES[0], None], ["J2", "G1", 2, STATUSES[1], 10], [None, "G1", 1, None, None]]))
+    batches = []
+
+    job, future = jobs.submit_import_job(str(path), "orders.xlsx", "admin", on_batch=batches.append)
+    assert future.result(timeout=30) == {"created": 2, "updated": 0}
+
+    assert seen == ["queued", "running", "done"]
+    assert [r["order_no"] for r in batches[0]] == ["J1", "J2"]
+    status = jobs.get_import_job_status(job.id)
+    assert status["status"] == "done" and status["rows"] == 2 and status["stats"]["skipped"] == 1
+    # The snapshot other workers read holds the final state; the upload is gone
+    assert json.loads((tmp_path / str(os.getpid()) / f"{job.id}.json").read_text())["status"] == "done"
+    assert not path.exists()
+
+
+def test_job_that_cannot_read_its_file_fails(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "_run_dir", None)
+    seen = _statuses_seen(monkeypatch)
+    path = tmp_path / "broken.xlsx"
+    path.write_bytes(b"not a workbook")
+
+    job, future = jobs.submit_import_job(str(path), "broken.xlsx")
+    with pytest.raises(Exception):
+        future.result(timeout=30)
+
+    assert seen == ["queued", "running", "failed"]
+    status = jobs.get_import_job_status(job.id)
+    assert status["status"] == "failed" and status["errors"]
+    assert not path.exists()
+
+
+class ImportJobEndpointTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.job_dir = tempfile.mkdtemp(prefix="automatica-jobs-")
+        self._saved = (jobs.IMPORT_JOB_DIR, jobs._run_dir)
+        jobs.IMPORT_JOB_DIR = self.job_dir
+        jobs.prepare_job_dir()
+
+    def tearDown(self):
+        jobs.IMPORT_JOB_DIR, jobs._run_dir = self._saved
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+        super().tearDown()
+
+    def upload(self, query: str, rows: list):
+        body, content_type = multipart({}, {"file": ("orders.xlsx", xlsx_bytes(rows))})
+        return self.api("POST", f"/orderapi/import/excel{query}", body, token=self.token(), headers={"Content-Type": content_type})
+
+    def test_wait_returns_the_final_result(self):
+        r = self.upload("?wait=1", [["W1", "G1", 1, STATUSES[0], None], ["W2", "G2", 2, STATUSES[0], None]])
+        self.assertEqual(r.code, 200, r.body)
+        body = json.loads(r.body)
+        self.assertEqual((body["created"], body["updated"]), (2, 0))
+        status = json.loads(self.api("GET", f"/orderapi/import/jobs/{body['job_id']}", token=self.token()).body)
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(self.api("GET", "/orderapi/orders/by-no/W2").code, 200)
+
+    def test_background_job_can_be_polled(self):
+        r = self.upload("", [["P1", "G1", 1, STATUSES[0], None]])
+        self.assertEqual(r.code, 202, r.body)
+        body = json.loads(r.body)
+        self.assertIn(body["job"]["status"], ("queued", "running", "done"))
+        for _ in range(200):
+            status = json.loads(self.api("GET", body["status_url"], token=self.token()).body)
+            if status["status"] in ("done", "failed"):
+                break
+            time.sleep(0.05)
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(status["stats"]["created"], 1)
+
+    def test_status_of_a_job_running_in_another_process(self):
+        # A sibling worker (same run directory) owns the job and writes its snapshot
+        script = (
+            "import sys; from backend import jobs; jobs._run_dir = sys.argv[1]; "
+            "job = jobs.ImportJob('other.xlsx', 'admin'); job.status = 'running'; job.rows = 7; "
+            "job.save_snapshot(); print(job.id)"
+        )
+        env = {**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parents[1])}
+        out = subprocess.run([sys.executable, "-c", script, jobs._run_dir], capture_output=True, text=True, env=env, check=True)
+        job_id = out.stdout.strip().splitlines()[-1]
+        self.assertIsNone(jobs.get_import_job(job_id))
+
+        r = self.api("GET", f"/orderapi/import/jobs/{job_id}", token=self.token())
+        self.assertEqual(r.code, 200, r.body)
+        status = json.loads(r.body)
+        self.assertEqual((status["id"], status["status"], status["rows"]), (job_id, "running", 7))
+        self.assertEqual(self.api("GET", "/orderapi/import/jobs/" + "0" * 32, token=self.token()).code, 404)
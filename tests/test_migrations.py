@@ -0,0 +1,28 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend.db import Base
+from backend.migrations import applied_versions, run_migrations
+
+
+def _legacy_engine(tmp_path, codes):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # user_codes as older releases created it: no unique index on code
+        conn.execute(text("CREATE TABLE user_codes (id INTEGER PRIMARY KEY, user_id INTEGER, code VARCHAR(64), created_at DATETIME)"))
+        for code in codes:
+            conn.execute(text("INSERT INTO user_codes (code) VALUES (:code)"), {"code": code})
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def test_duplicate_user_codes_stop_the_unique_index(tmp_path):
+    engine = _legacy_engine(tmp_path, ["A1", "A1", "B2", "C3", "C3", "C3"])
+    with pytest.raises(RuntimeError, match=r"'A1' x2, 'C3' x3"):
+        run_migrations(engine)
+    with engine.connect() as conn:
+        assert applied_versions(conn) == set()
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM user_codes WHERE code IN ('A1', 'C3')"))
+    assert run_migrations(engine) == [1, 2, 3]
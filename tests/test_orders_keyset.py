@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from backend.db import SessionLocal
+from backend.models import STATUSES, Order
+from backend.server import encode_cursor
+from support import ApiTestCase
+
+BASE = datetime(2024, 5, 1, 12, 0, 0)
+
+
+class KeysetPagingTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        db = SessionLocal()
+        # Only four distinct timestamps, so most pages end inside a run of ties
+        for i in range(27):
+            db.add(Order(
+                order_no=f"K{i:02d}", group_code="G1" if i % 3 else "G2", weight_kg=1.0,
+                status=STATUSES[i % 2], updated_at=BASE - timedelta(minutes=i % 4),
+            ))
+        db.commit()
+        rows = db.query(Order).order_by(Order.updated_at.desc(), Order.id.desc()).all()
+        self.expected = [(o.order_no, o.group_code, o.status) for o in rows]
+        db.close()
+
+    def walk(self, query: str, size: int) -> list:
+        seen = []
+        cursor = ""
+        for _ in range(100):
+            r = self.api("GET", f"/orderapi/orders?page_size={size}&cursor={cursor}{query}")
+            self.assertEqual(r.code, 200, r.body)
+            body = json.loads(r.body)
+            self.assertLessEqual(len(body["orders"]), size)
+            seen += [(o["order_no"], o["group_code"], o["status"]) for o in body["orders"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return seen
+        self.fail("cursor never ran out")
+
+    def test_following_next_cursor_visits_every_row_once(self):
+        for size in (1, 4, 5, 27, 200):
+            self.assertEqual(self.walk("", size), self.expected)
+
+    def test_filters_apply_on_every_page(self):
+        for query, keep in (
+            ("&code=G1", lambda r: r[1] == "G1"),
+            (f"&code=G1&status={STATUSES[1]}", lambda r: r[1] == "G1" and r[2] == STATUSES[1]),
+            (f"&status={STATUSES[0]}", lambda r: r[2] == STATUSES[0]),
+        ):
+            self.assertEqual(self.walk(query, 3), [r for r in self.expected if keep(r)])
+
+    def test_malformed_or_tampered_cursor_is_a_400(self):
+        def raw(value) -> str:
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+        bad = [
+            "not-a-cursor", "%%%", "e30", "订单", encode_cursor(BASE, 5)[:-3],
+            raw({"updated_at": "2024-05-01"}), raw(["2024-05-01T00:00:00"]), raw(["yesterday", 1]),
+            raw(["2024-05-01T00:00:00", "x"]), raw(["2024-05-01T00:00:00", 10 ** 30]),
+            raw(["2024-05-01T00:00:00", -1]), raw(["2024-05-01T00:00:00+08:00", 1]), raw([None, 1]),
+        ]
+        for cursor in bad:
+            r = self.api("GET", f"/orderapi/orders?cursor={cursor}")
+            self.assertEqual(r.code, 400, (cursor, r.code, r.body))
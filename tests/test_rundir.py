@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+from backend.rundir import prepare_run_dir
+
+
+def test_prepare_run_dir_keeps_live_runs_and_drops_exited_ones(tmp_path):
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    dead_pid = int(exited.stdout)
+    live = tmp_path / str(os.getppid())
+    dead = tmp_path / str(dead_pid)
+    own = tmp_path / str(os.getpid())
+    for d in (live, dead, own):
+        d.mkdir()
+        (d / "1.sock").write_text("")
+
+    path = prepare_run_dir(str(tmp_path))
+
+    assert path == str(own)
+    assert os.listdir(own) == []
+    assert (live / "1.sock").exists()
+    assert not dead.exists()
@@ -0,0 +1,65 @@
+from backend.db import SessionLocal
+from backend.importer import bulk_upsert_rows, import_rows, normalize_row
+from backend.models import OrderSummary
+from backend.summary import rebuild
+
+
+def _snapshot(session):
+    session.expire_all()
+    return sorted(
+        (r.group_code, r.status, r.order_count, round(r.total_weight, 6), round(r.total_fee, 6), round(r.unpriced_weight, 6))
+        for r in session.query(OrderSummary)
+    )
+
+
+def _rebuilt(session):
+    rebuild(session)
+    session.commit()
+    return _snapshot(session)
+
+
+def _rows(*raw):
+    return [normalize_row(dict(zip(("order_no", "group_code", "weight_kg", "status", "shipping_fee"), r))) for r in raw]
+
+
+def test_overlapping_batches_match_rebuild(db):
+    import_rows(db, [
+        {"order_no": f"O{i}", "group_code": "G1", "weight_kg": 1.0 + i, "status": "打包发出", "shipping_fee": None}
+        for i in range(8)
+    ])
+    # Two batches from separate sessions touching the same order numbers and
+    # the same (group_code, status) keys; the second sees the first's writes
+    first = _rows(
+        ("O1", "G2", None, "已结算", 10),
+        ("O2", "G2", 3.5, "已结算", None),
+        ("O3", None, None, "已发往俄罗斯", None),
+        ("N1", "G2", 2.0, "已结算", None),
+    )
+    second = _rows(
+        ("O2", "G1", None, "打包发出", 4),
+        ("O3", "G2", 1.5, "已结算", None),
+        ("N1", "G1", None, "打包发出", None),
+        ("O1", "G2", 6.0, "已结算", None),
+        ("O1", None, None, "已结算", None),  # repeated within the batch
+    )
+    other = SessionLocal()
+    try:
+        assert bulk_upsert_rows(db, first) == (1, 3)
+        assert bulk_upsert_rows(other, second) == (0, 5)
+    finally:
+        other.close()
+
+    live = _snapshot(db)
+    assert live == _rebuilt(db)
+    assert sum(r[2] for r in live) == 9
+
+
+def test_import_batches_match_rebuild(db):
+    rows = [
+        {"order_no": f"B{i % 5}", "group_code": f"G{i % 3}", "weight_kg": i or None, "status": "已结算" if i % 2 else "打包发出",
+         "shipping_fee": i * 2 if i % 4 == 0 else None}
+        for i in range(20)
+    ]
+    # Small batches so consecutive batches rewrite the same orders and keys
+    import_rows(db, rows, batch_size=3)
+    assert _snapshot(db) == _rebuilt(db)
@@ -0,0 +1,110 @@
+import io
+
+import pytest
+
+from backend import server
+from backend.uploads import MAX_PART_HEADER_BYTES, MultipartFileSink, UploadError, multipart_boundary
+from support import ApiTestCase, multipart
+
+# Looks like the start of the delimiter and spans chunk edges below
+PAYLOAD = b"PK\x03\x04" + b"\r\n--testboundary7MA" + bytes(range(256)) * 20 + b"\r\n-"
+
+
+def _sink(body: bytes, chunk_size: int, field: str = "file") -> tuple:
+    out = io.BytesIO()
+    sink = MultipartFileSink(b"testboundary7MA4YWxk", field, out)
+    for start in range(0, len(body), chunk_size):
+        sink.feed(body[start:start + chunk_size])
+    return sink, out
+
+
+def test_boundary_from_content_type():
+    assert multipart_boundary('multipart/form-data; charset=utf-8; boundary="a b"') == b"a b"
+    assert multipart_boundary("application/json") is None
+    assert multipart_boundary("multipart/form-data") is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 23, 64, 4096, 1 << 20])
+def test_delimiters_split_across_chunks(chunk_size):
+    body, _ = multipart({"note": "x"}, {"file": ("orders.xlsx", PAYLOAD)})
+    sink, out = _sink(body, chunk_size)
+    sink.close()
+    assert sink.found and sink.filename == "orders.xlsx"
+    assert out.getvalue() == PAYLOAD
+    assert sink.size == len(PAYLOAD)
+
+
+def test_other_parts_are_skipped_and_only_the_first_file_is_kept():
+    first, _ = multipart({"a": "1"}, {"other": ("x.xlsx", b"OTHER"), "file": ("one.xlsx", b"ONE")})
+    second, _ = multipart({"b": "2"}, {"file": ("two.xlsx", b"TWO")})
+    # Drop the first body's closing delimiter so both sets of parts form one body
+    body = first[: -len(b"--testboundary7MA4YWxk--\r\n")] + second
+    sink, out = _sink(body, 5)
+    sink.close()
+    assert sink.filename == "one.xlsx"
+    assert out.getvalue() == b"ONE"
+
+
+def test_missing_file_part():
+    body, _ = multipart({"file": "not a file", "note": "x"}, {})
+    sink, out = _sink(body, 3)
+    sink.close()
+    assert not sink.found and sink.filename is None
+    assert out.getvalue() == b""
+
+
+@pytest.mark.parametrize("cut", [10, 200, -30, -3])
+def test_truncated_body_raises(cut):
+    body, _ = multipart({}, {"file": ("orders.xlsx", PAYLOAD)})
+    sink, _ = _sink(body[:cut], 16)
+    with pytest.raises(UploadError):
+        sink.close()
+
+
+def test_malformed_boundary_line_raises():
+    with pytest.raises(UploadError):
+        _sink(b"--testboundary7MA4YWxkXX\r\n", 4)
+
+
+def test_part_header_size_limit():
+    head = b"--testboundary7MA4YWxk\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.xlsx\"\r\n"
+    big = head + b"X-Pad: " + b"p" * (MAX_PART_HEADER_BYTES + 1)
+    with pytest.raises(UploadError, match="too large"):
+        _sink(big, 1024)
+    # Just under the limit is fine
+    ok = head + b"X-Pad: " + b"p" * (MAX_PART_HEADER_BYTES - len(head) - 100) + b"\r\n\r\nDATA\r\n--testboundary7MA4YWxk--\r\n"
+    sink, out = _sink(ok, 1024)
+    sink.close()
+    assert out.getvalue() == b"DATA"
+
+
+@pytest.mark.parametrize("disposition", [
+    'filename="订单 10月.xlsx"'.encode("utf-8"),
+    b"filename*=UTF-8''%E8%AE%A2%E5%8D%95%2010%E6%9C%88.xlsx",
+])
+def test_non_ascii_filenames(disposition):
+    body = (
+        b"--testboundary7MA4YWxk\r\nContent-Disposition: form-data; name=\"file\"; " + disposition
+        + b"\r\n\r\nDATA\r\n--testboundary7MA4YWxk--\r\n"
+    )
+    sink, out = _sink(body, 9)
+    sink.close()
+    assert sink.filename == "订单 10月.xlsx"
+    assert out.getvalue() == b"DATA"
+
+
+class ImportUploadLimitTest(ApiTestCase):
+    def test_declared_length_over_limit_is_rejected_before_reading(self):
+        body, content_type = multipart({}, {"file": ("big.xlsx", b"x" * 4096)})
+        original = server.IMPORT_MAX_BYTES
+        server.IMPORT_MAX_BYTES = 1024
+        try:
+            r = self.api("POST", "/orderapi/import/excel", body, token=self.token(), headers={"Content-Type": content_type})
+        finally:
+            server.IMPORT_MAX_BYTES = original
+        self.assertEqual(r.code, 413)
+
+    def test_truncated_upload_is_a_client_error(self):
+        body, content_type = multipart({}, {"file": ("orders.xlsx", b"data")})
+        r = self.api("POST", "/orderapi/import/excel", body[:-20], token=self.token(), headers={"Content-Type": content_type})
+        self.assertEqual(r.code, 400)
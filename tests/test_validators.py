@@ -0,0 +1,78 @@
+import email.utils
+from datetime import datetime, timedelta, timezone
+
+from backend.db import SessionLocal
+from backend.models import STATUSES, Order
+from support import ApiTestCase
+
+HOUR_AGO = datetime.utcnow().replace(microsecond=0) - timedelta(hours=1)
+
+
+def http_date(dt: datetime) -> str:
+    return email.utils.format_datetime(dt.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+class ConditionalGetTest(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        db = SessionLocal()
+        db.add(Order(order_no="V1", group_code="GV", weight_kg=1.0, status=STATUSES[0], updated_at=HOUR_AGO))
+        db.add(Order(order_no="V2", group_code="GV", weight_kg=2.0, status=STATUSES[0], updated_at=HOUR_AGO))
+        db.commit()
+        db.close()
+        r = self.api("GET", "/orderapi/orders/by-no/V1")
+        self.assertEqual(r.code, 200)
+        self.etag = r.headers["Etag"]
+        self.last_modified = r.headers["Last-Modified"]
+        self.assertTrue(self.etag.startswith('W/"'))
+
+    def status_for(self, path="/orderapi/orders/by-no/V1", **headers) -> int:
+        return self.api("GET", path, headers={k.replace("_", "-"): v for k, v in headers.items()}).code
+
+    def test_if_none_match(self):
+        strong = self.etag[2:]
+        self.assertEqual(self.status_for(If_None_Match=self.etag), 304)
+        # Weak comparison: the W/ prefix is ignored on either side
+        self.assertEqual(self.status_for(If_None_Match=strong), 304)
+        self.assertEqual(self.status_for(If_None_Match=f'"other", W/"nope", {strong}'), 304)
+        self.assertEqual(self.status_for(If_None_Match="*"), 304)
+        self.assertEqual(self.status_for(If_None_Match='W/"other", "nope"'), 200)
+        self.assertEqual(self.status_for(If_None_Match=""), 200)
+
+    def test_not_modified_keeps_validators(self):
+        r = self.api("GET", "/orderapi/orders/by-no/V1", headers={"If-None-Match": self.etag})
+        self.assertEqual(r.code, 304)
+        self.assertEqual(r.headers["Etag"], self.etag)
+        self.assertEqual(r.body, b"")
+
+    def test_if_modified_since(self):
+        self.assertEqual(self.status_for(If_Modified_Since=self.last_modified), 304)
+        self.assertEqual(self.status_for(If_Modified_Since=http_date(HOUR_AGO + timedelta(minutes=5))), 304)
+        self.assertEqual(self.status_for(If_Modified_Since=http_date(HOUR_AGO - timedelta(seconds=1))), 200)
+        self.assertEqual(self.status_for(If_Modified_Since="not a date"), 200)
+
+    def test_if_none_match_takes_precedence(self):
+        old = http_date(HOUR_AGO - timedelta(days=1))
+        self.assertEqual(self.status_for(If_None_Match='"other"', If_Modified_Since=self.last_modified), 200)
+        self.assertEqual(self.status_for(If_None_Match=self.etag, If_Modified_Since=old), 304)
+
+    def test_no_304_inside_the_settle_window(self):
+        r = self.api("PUT", "/orderapi/orders/by-no/V1", {"status": STATUSES[1]}, token=self.token())
+        self.assertEqual(r.code, 200)
+        fresh = self.api("GET", "/orderapi/orders/by-no/V1")
+        etag, last_modified = fresh.headers["Etag"], fresh.headers["Last-Modified"]
+        # Another write could land within the same second and keep these validators
+        self.assertEqual(self.status_for(If_None_Match=etag), 200)
+        self.assertEqual(self.status_for(If_Modified_Since=last_modified), 200)
+
+    def test_order_list_validates_by_etag_only(self):
+        path = "/orderapi/orders?code=GV"
+        r = self.api("GET", path)
+        self.assertEqual(r.code, 200)
+        etag = r.headers["Etag"]
+        self.assertEqual(self.status_for(path, If_None_Match=etag), 304)
+        self.assertEqual(self.status_for(path, If_Modified_Since=http_date(datetime.utcnow())), 200)
+        # Deleting V2 leaves the newest updated_at unchanged; only the ETag notices
+        self.assertEqual(self.api("DELETE", "/orderapi/orders/by-no/V2", token=self.token()).code, 204)
+        self.assertEqual(self.status_for(path, If_Modified_Since=http_date(datetime.utcnow())), 200)
+        self.assertEqual(self.status_for(path, If_None_Match=etag), 200)
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Endpoint latency benchmark for the Tornado backend.
+
+Boots make_app() in-process against a local SQLite database seeded with
+tools/gen_orders.py data (or targets a running server with --url), drives
+the main routes at each concurrency level and reports throughput and
+p50/p95/p99 latency. Results are saved as JSON and can be compared with a
+baseline run; the exit code is 1 when a scenario regressed.
+
+Examples:
+  python tools/bench.py --rows 100000 --out bench/baseline.json
+  python tools/bench.py --rows 100000 --baseline bench/baseline.json --out bench/current.json
+  python tools/bench.py --scenarios orders_code,by_no --concurrency 1,16,64 --requests 500
+  WORKERS=4 python -m backend.server &  python tools/bench.py --url http://127.0.0.1:8000 --reuse-db
+
+Numbers from the in-process mode include the client running on the same
+event loop; compare runs made the same way on the same machine.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+ROOT = Path(__file__).resolve().parents[1]
+BENCH_ADMIN_PASSWORD = "bench-admin-password"
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def multipart(field: str, filename: str, data: bytes):
+    boundary = "----automatica-bench"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        "Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+############################################################
+# Dataset
+############################################################
+
+def prepare_env(args) -> str:
+    """Point the backend at the bench database; must run before importing backend."""
+    db_path = Path(args.db).resolve()
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("STRICT_ORIGIN", "false")
+    os.environ["ADMIN_PASSWORD"] = BENCH_ADMIN_PASSWORD
+    os.environ.pop("ADMIN_PASSWORD_HASH", None)
+    os.environ.setdefault("LOG_DB_CREDS", "false")
+    os.environ.setdefault("SLOW_QUERY_MS", "0")
+    if args.cold_caches:
+        for name in ("ORDER_CACHE_TTL", "SETTINGS_CACHE_TTL", "AUTH_CACHE_TTL"):
+            os.environ[name] = "0"
+    return str(db_path)
+
+
+def seed(args, db_path: str):
+    sys.path.insert(0, str(ROOT / "tools"))
+    from gen_orders import OrderGenerator, Progress, load_db
+
+    if args.reuse_db and os.path.exists(db_path):
+        print(f"Reusing {db_path}", file=sys.stderr)
+        return
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    gen = OrderGenerator(args.rows, max(5, args.rows // 250), 365, 0.03, 0.3, "GEN-", args.seed)
+    load_db(gen, Progress(args.rows), clear=False)
+
+
+def sample_inputs(args) -> dict:
+    """Pick realistic parameters (big/small groups, existing order numbers) from the data."""
+    from sqlalchemy import func
+
+    from backend.db import SessionLocal
+    from backend.models import Order
+
+    db = SessionLocal()
+    try:
+        groups = (
+            db.query(Order.group_code, func.count(Order.id))
+            .filter(Order.group_code.isnot(None))
+            .group_by(Order.group_code)
+            .order_by(func.count(Order.id).desc())
+            .all()
+        )
+        total = db.query(func.count(Order.id)).scalar() or 0
+        rng = random.Random(args.seed)
+        offsets = [rng.randrange(total) for _ in range(min(500, total))] if total else []
+        order_nos = [db.query(Order.order_no).order_by(Order.id).offset(o).limit(1).scalar() for o in offsets]
+    finally:
+        db.close()
+    return {
+        "big_group": groups[0][0] if groups else "B000000",
+        "small_group": groups[-1][0] if groups else "B000000",
+        "order_nos": [n for n in order_nos if n] or ["missing"],
+        "total": total,
+    }
+
+
+def make_import_file(rows: int, seed: int) -> bytes:
+    sys.path.insert(0, str(ROOT / "tools"))
+    from gen_orders import OrderGenerator, Progress, write_xlsx
+
+    # Same prefix and numbering as the seeded data, so the upload exercises
+    # the update path of the upsert rather than only inserts
+    gen = OrderGenerator(rows, max(5, rows // 250), 365, 0.03, 0.3, "GEN-", seed + 1)
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(gen, Path(path), Progress(rows))
+        return Path(path).read_bytes()
+    finally:
+        os.remove(path)
+
+
+############################################################
+# Scenarios
+############################################################
+
+def build_scenarios(inputs: dict, import_bytes: bytes) -> dict:
+    """name -> (request count factor, max concurrency or None, request builder)."""
+    today = datetime.utcnow().date()
+    month_ago = today - timedelta(days=30)
+    order_nos = inputs["order_nos"]
+    upload_body, upload_type = multipart("file", "bench.xlsx", import_bytes)
+
+    def get(path, **params):
+        return lambda i: ("GET", path + ("?" + urlencode(params) if params else ""), None, {}, False)
+
+    return {
+        "orders_all": (1.0, None, get("/orderapi/orders", page_size=20)),
+        "orders_code": (1.0, None, get("/orderapi/orders", code=inputs["big_group"], page_size=20)),
+        "orders_code_small": (1.0, None, get("/orderapi/orders", code=inputs["small_group"], page_size=20)),
+        "orders_unassigned": (1.0, None, get("/orderapi/orders", code="A", page_size=20)),
+        "orders_status": (1.0, None, get("/orderapi/orders", status="已到达彼得堡", page_size=20)),
+        "orders_dates": (1.0, None, get("/orderapi/orders", start_date=month_ago.isoformat(), end_date=today.isoformat(), page_size=20)),
+        "orders_deep_page": (1.0, None, get("/orderapi/orders", page=200, page_size=20)),
+        "orders_cursor": (1.0, None, get("/orderapi/orders", code=inputs["big_group"], cursor="", page_size=20, with_count=0)),
+        "by_no": (1.0, None, lambda i: ("GET", f"/orderapi/orders/by-no/{order_nos[i % len(order_nos)]}", None, {}, False)),
+        "announcement": (1.0, None, get("/orderapi/announcement")),
+        "orders_summary": (1.0, None, lambda i: ("GET", "/orderapi/orders/summary", None, {}, True)),
+        "export_csv": (0.05, 4, lambda i: ("GET", "/orderapi/orders/export?" + urlencode({"format": "csv", "code": inputs["big_group"]}), None, {}, True)),
+        "export_xlsx": (0.05, 4, lambda i: ("GET", "/orderapi/orders/export?" + urlencode({"format": "xlsx", "code": inputs["big_group"]}), None, {}, True)),
+        "import_excel": (0.02, 2, lambda i: ("POST", "/orderapi/import/excel?wait=1", upload_body, {"Content-Type": upload_type}, True)),
+    }
+
+
+async def run_level(client, base_url: str, token: str, builder, n: int, concurrency: int) -> dict:
+    from tornado.httpclient import HTTPClientError
+
+    latencies = []
+    errors = 0
+    statuses: dict[str, int] = {}
+    counter = iter(range(n))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, body, headers, auth = builder(i)
+            if auth:
+                headers = {**headers, "Authorization": f"Bearer {token}"}
+            start = time.perf_counter()
+            try:
+                resp = await client.fetch(base_url + path, method=method, body=body, headers=headers,
+                                          raise_error=False, request_timeout=600)
+                code = resp.code
+            except HTTPClientError as exc:
+                code = exc.code
+            except Exception:
+                code = 599
+            latencies.append(time.perf_counter() - start)
+            statuses[str(code)] = statuses.get(str(code), 0) + 1
+            if code >= 400 or code < 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+async def bench(args, scenarios: dict) -> dict:
+    import tornado.httpserver
+    from tornado.httpclient import AsyncHTTPClient
+    from tornado.testing import bind_unused_port
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        from backend.server import make_app
+
+        sock, port = bind_unused_port()
+        server = tornado.httpserver.HTTPServer(make_app(), max_body_size=1 << 30)
+        server.add_sockets([sock])
+        base_url = f"http://127.0.0.1:{port}"
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    AsyncHTTPClient.configure(None, max_clients=max(levels) + 4)
+    client = AsyncHTTPClient()
+    resp = await client.fetch(base_url + "/orderapi/login", method="POST",
+                              body=json.dumps({"username": "admin", "password": args.admin_password}))
+    token = json.loads(resp.body)["access_token"]
+
+    results: dict[str, dict] = {}
+    try:
+        for name, (factor, max_conc, builder) in scenarios.items():
+            results[name] = {}
+            n = max(2, int(args.requests * factor))
+            # Warm caches/pools so the first level is not penalised
+            await run_level(client, base_url, token, builder, min(n, args.warmup), 1)
+            for conc in levels:
+                if max_conc and conc > max_conc:
+                    continue
+                stats = await run_level(client, base_url, token, builder, max(n, conc), conc)
+                results[name][str(conc)] = stats
+                print(
+                    f"{name:<20} c={conc:<4} n={stats['requests']:<6} {stats['throughput_rps']:>9.1f} req/s  "
+                    f"p50 {stats['p50_ms']:>8.2f}  p95 {stats['p95_ms']:>8.2f}  p99 {stats['p99_ms']:>8.2f} ms"
+                    + (f"  errors {stats['errors']} {stats['statuses']}" if stats["errors"] else ""),
+                    file=sys.stderr,
+                )
+    finally:
+        client.close()
+        if server is not None:
+            server.stop()
+    return results
+
+
+############################################################
+# Baseline comparison
+############################################################
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Return (scenario, concurrency, message) for every regression beyond ``threshold``."""
+    regressions = []
+    for name, levels in current["results"].items():
+        for conc, stats in levels.items():
+            base = baseline.get("results", {}).get(name, {}).get(conc)
+            if not base:
+                continue
+            p95_ratio = stats["p95_ms"] / base["p95_ms"] if base["p95_ms"] else 1.0
+            rps_ratio = stats["throughput_rps"] / base["throughput_rps"] if base["throughput_rps"] else 1.0
+            line = f"{name:<20} c={conc:<4} p95 {base['p95_ms']:.2f} -> {stats['p95_ms']:.2f} ms ({p95_ratio - 1:+.0%})  " \
+                   f"rps {base['throughput_rps']:.1f} -> {stats['throughput_rps']:.1f} ({rps_ratio - 1:+.0%})"
+            bad = p95_ratio > 1 + threshold or rps_ratio < 1 - threshold or stats["errors"] > base.get("errors", 0)
+            print(("REGRESSION " if bad else "ok         ") + line, file=sys.stderr)
+            if bad:
+                regressions.append((name, conc, line))
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the main API routes.")
+    ap.add_argument("--rows", type=int, default=50_000, help="orders to seed (default 50000)")
+    ap.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "automatica-bench.db"), help="SQLite file for the bench database")
+    ap.add_argument("--reuse-db", action="store_true", help="keep an existing --db instead of reseeding")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    ap.add_argument("--requests", type=int, default=300, help="requests per scenario and level (exports/imports run fewer)")
+    ap.add_argument("--warmup", type=int, default=10)
+    ap.add_argument("--scenarios", default="", help="comma separated subset of scenario names")
+    ap.add_argument("--import-rows", type=int, default=2000, help="rows in the uploaded workbook for import_excel")
+    ap.add_argument("--cold-caches", action="store_true", help="disable in-process response caches (TTL 0)")
+    ap.add_argument("--url", help="benchmark a running server instead of booting make_app() in-process")
+    ap.add_argument("--admin-password", default=BENCH_ADMIN_PASSWORD, help="admin password when using --url")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--baseline", help="compare against a previous results JSON")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed p95/throughput change vs baseline (default 0.2)")
+    args = ap.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    db_path = prepare_env(args)
+    if not args.url:
+        seed(args, db_path)
+    inputs = sample_inputs(args)
+    scenarios = build_scenarios(inputs, make_import_file(args.import_rows, args.seed))
+    if args.scenarios:
+        wanted = {s.strip() for s in args.scenarios.split(",") if s.strip()}
+        unknown = wanted - set(scenarios)
+        if unknown:
+            raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}; available: {', '.join(scenarios)}")
+        scenarios = {k: v for k, v in scenarios.items() if k in wanted}
+
+    print(f"Benchmarking {len(scenarios)} scenarios over {inputs['total']:,} orders", file=sys.stderr)
+    results = asyncio.run(bench(args, scenarios))
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "rows": inputs["total"],
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "cold_caches": args.cold_caches,
+            "target": args.url or "in-process",
+        },
+        "results": results,
+    }
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Wrote {args.out}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Generate a large synthetic orders dataset for performance testing.
+
+Rows mimic production shape rather than uniform noise:
+  - group_code: a few large groups and a long tail (Zipf-like weights),
+    plus a share of orders without a group (shown as code "A")
+  - status: follows the shipping pipeline; older orders are further along
+    (STATUSES order), so most old orders are settled and recent ones in transit
+  - created_at / updated_at: spread over --days, denser towards today
+  - weight_kg: log-normal around a few kg; shipping_fee often empty
+    (computed from RATE_PER_KG by the backend)
+
+Outputs:
+  xlsx  import file for /orderapi/import/excel (write-only workbook, constant memory)
+  csv   same columns as db/seed_demo_orders_test.csv (+ dates with --with-dates)
+  db    direct batched INSERT into the configured database (keeps the date spread)
+
+Examples:
+  python tools/gen_orders.py --rows 100000 --format xlsx --out /tmp/orders-100k.xlsx
+  python tools/gen_orders.py --rows 5000000 --format csv --out /tmp/orders-5m.csv --with-dates
+  DATABASE_URL=sqlite:////tmp/perf.db python tools/gen_orders.py --rows 1000000 --format db
+"""
+
+import argparse
+import bisect
+import csv
+import itertools
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from backend.models import STATUSES  # noqa: E402
+
+HEADERS = ["order_no", "group_code", "weight_kg", "status", "shipping_fee"]
+DATE_HEADERS = ["created_at", "updated_at"]
+XLSX_MAX_ROWS = 1_048_575  # sheet limit minus the header row
+BATCH = 5000
+
+
+class OrderGenerator:
+    def __init__(self, rows: int, groups: int, days: int, unassigned: float, fee_share: float,
+                 prefix: str, seed: int, zipf: float = 1.1, stage_days: float = 6.0):
+        self.rows = rows
+        self.days = days
+        self.unassigned = unassigned
+        self.fee_share = fee_share
+        self.prefix = prefix
+        self.stage_days = stage_days
+        self.rng = random.Random(seed)
+        self.now = datetime.utcnow().replace(microsecond=0)
+        year = self.now.year % 100
+        self.codes = [f"{chr(ord('B') + i % 25)}{year:02d}{i:04d}" for i in range(groups)]
+        weights = [1.0 / math.pow(rank + 1, zipf) for rank in range(groups)]
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def _group(self):
+        if self.rng.random() < self.unassigned:
+            return None
+        x = self.rng.random() * self.cum_weights[-1]
+        return self.codes[bisect.bisect_left(self.cum_weights, x)]
+
+    def _row(self, i: int) -> dict:
+        rng = self.rng
+        # u ** 1.6 puts more orders near today, like a growing business
+        age_days = self.days * (rng.random() ** 1.6)
+        created = self.now - timedelta(days=age_days, seconds=rng.randint(0, 86399))
+        stage = min(len(STATUSES) - 1, int(max(0.0, rng.gauss(age_days / self.stage_days, 0.8))))
+        # Last status change happened somewhere between creation and now
+        updated = created + timedelta(days=min(age_days, stage * self.stage_days * rng.uniform(0.7, 1.1)))
+        created, updated = created.replace(microsecond=0), updated.replace(microsecond=0)
+        weight = round(min(200.0, max(0.1, rng.lognormvariate(math.log(3.0), 0.8))), 2)
+        fee = round(weight * rng.uniform(10.0, 15.0), 2) if rng.random() < self.fee_share else None
+        return {
+            "order_no": f"{self.prefix}{i:09d}",
+            "group_code": self._group(),
+            "weight_kg": weight,
+            "status": STATUSES[stage],
+            "shipping_fee": fee,
+            "wooden_crate": True if rng.random() < 0.1 else (None if rng.random() < 0.6 else False),
+            "created_at": created,
+            "updated_at": updated,
+        }
+
+    def batches(self, size: int = BATCH):
+        for start in range(0, self.rows, size):
+            yield [self._row(i) for i in range(start, min(self.rows, start + size))]
+
+
+class Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self._last = 0.0
+
+    def add(self, n: int):
+        self.done += n
+        now = time.perf_counter()
+        if now - self._last >= 2 or self.done >= self.total:
+            self._last = now
+            elapsed = now - self.started
+            rate = self.done / elapsed if elapsed else 0.0
+            print(f"  {self.done:>10,}/{self.total:,} rows  {rate:,.0f} rows/s", file=sys.stderr)
+
+
+def write_xlsx(gen: OrderGenerator, out: Path, progress: Progress):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("orders")
+    ws.append(HEADERS)
+    for batch in gen.batches():
+        for r in batch:
+            ws.append([r[h] for h in HEADERS])
+        progress.add(len(batch))
+    wb.save(str(out))
+
+
+def write_csv(gen: OrderGenerator, out: Path, progress: Progress, with_dates: bool):
+    headers = HEADERS + (DATE_HEADERS if with_dates else [])
+    with out.open("w", encoding="utf-8", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(headers)
+        for batch in gen.batches():
+            w.writerows(
+                ["" if r[h] is None else (r[h].isoformat(sep=" ") if isinstance(r[h], datetime) else r[h]) for h in headers]
+                for r in batch
+            )
+            progress.add(len(batch))
+
+
+def load_db(gen: OrderGenerator, progress: Progress, clear: bool):
+    from sqlalchemy import delete, insert
+
+    from backend.db import SessionLocal, db_connection_summary, init_db
+    from backend.models import Order
+    from backend.summary import rebuild as rebuild_summary
+
+    init_db()
+    print(f"Loading into {db_connection_summary()}", file=sys.stderr)
+    db = SessionLocal()
+    try:
+        if clear:
+            n = db.execute(delete(Order).where(Order.order_no.like(f"{gen.prefix}%"))).rowcount
+            db.commit()
+            print(f"Removed {n} existing {gen.prefix}* orders", file=sys.stderr)
+        for batch in gen.batches():
+            db.execute(insert(Order), batch)
+            db.commit()
+            progress.add(len(batch))
+        # Direct inserts bypass the write paths that maintain order_summary
+        n = rebuild_summary(db)
+        db.commit()
+        print(f"Rebuilt order_summary ({n} rows)", file=sys.stderr)
+    finally:
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate synthetic orders (xlsx / csv / direct DB load).")
+    ap.add_argument("--rows", type=int, default=100_000, help="number of orders (default 100000)")
+    ap.add_argument("--groups", type=int, default=None, help="distinct group codes (default rows/250, at least 5)")
+    ap.add_argument("--days", type=int, default=365, help="spread of created_at over the last N days")
+    ap.add_argument("--unassigned", type=float, default=0.03, help="share of orders without group_code")
+    ap.add_argument("--fee-share", type=float, default=0.3, help="share of orders with an explicit shipping_fee")
+    ap.add_argument("--prefix", default="GEN-", help="order_no prefix (default GEN-)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--format", choices=["xlsx", "csv", "db"], default="xlsx")
+    ap.add_argument("--out", help="output file for xlsx/csv")
+    ap.add_argument("--with-dates", action="store_true", help="csv: add created_at/updated_at columns")
+    ap.add_argument("--clear", action="store_true", help="db: delete existing orders with --prefix first")
+    args = ap.parse_args()
+
+    if args.rows < 1:
+        raise SystemExit("--rows must be positive")
+    if args.format == "xlsx" and args.rows > XLSX_MAX_ROWS:
+        raise SystemExit(f"xlsx sheets hold at most {XLSX_MAX_ROWS:,} rows; use --format csv or db")
+    if args.format != "db" and not args.out:
+        raise SystemExit("--out is required for xlsx/csv")
+
+    groups = args.groups or max(5, args.rows // 250)
+    gen = OrderGenerator(args.rows, groups, args.days, args.unassigned, args.fee_share, args.prefix, args.seed)
+    progress = Progress(args.rows)
+    print(f"Generating {args.rows:,} orders in {groups:,} groups ({args.format})", file=sys.stderr)
+    if args.format == "xlsx":
+        write_xlsx(gen, Path(args.out), progress)
+    elif args.format == "csv":
+        write_csv(gen, Path(args.out), progress, args.with_dates)
+    else:
+        load_db(gen, progress, args.clear)
+    if args.out:
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()